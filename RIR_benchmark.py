@@ -0,0 +1,176 @@
+"""Benchmark the hot paths of the RIR generation offline and compare the timings against a baseline, e.g. before and after an upgrade of rir_generator or numpy
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import numpy as np
+from helper import ArrayStructures, UniformSphericalSampling
+from helper.Quaternions import QuatProc
+from helper.StreamWriter import PickleStreamWriter
+from helper import RIRCodec
+from helper.Convolution import convolve
+from RIR_write_quaternion import sample_room, verify_positions, sample_placement, generate_rir, write
+from config.config import backend, rate
+
+# geometry of the generate_rir cases
+ROOM = np.array([5., 7., 3.])
+MICS = {'ULA': 0.08, 'CUA': 0.05, 'SUA': 0.05}
+
+def measure(func, repeat=5, number=1):
+    """Function that times a function as timeit.repeat does
+
+    :param func: function without arguments
+    :param repeat: (int) number of timings
+    :param number: (int) number of calls per timing
+    :return: dict with the minimal, median and maximal time per call in seconds
+    :rtype: dict
+    """
+    func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start)/number)
+    return {'min': min(times), 'median': float(np.median(times)), 'max': max(times), 'repeat': repeat, 'number': number}
+
+proc = QuatProc()
+
+def placement_loop(room, offsets, source_vec_off, rng):
+    """Function that places an array and a source with one candidate at a time by sample_room, QuatProc.rotate and verify_positions, as before sample_placement
+    """
+    while True:
+        pos = sample_room(room, rng=rng)
+        angle, axis = rng.uniform(0, 2*np.pi), proc.random_rotation(rng)
+        mics = pos + np.array([proc.rotate(angle, axis, offset) for offset in offsets])
+        source = pos + proc.rotate(angle, axis, source_vec_off[0])
+        if verify_positions(room, mics, source):
+            return mics, source
+
+def get_cases(tmpdir, backend=backend, quick=False):
+    """Function that returns all benchmark cases
+
+    :param tmpdir: (str) directory the write cases write to
+    :param backend: (str) backend of the generate_rir cases, see helper.Backends
+    :param quick: (bool) only the short generate_rir configurations
+    :return: list of (name, function, number of calls per timing)
+    :rtype: list
+    """
+    rng = np.random.default_rng(0)
+    points = rng.standard_normal((64, 3))
+    axis = np.array([0., 0., 1.])
+    cases = [
+        ('QuatProc.rotate', lambda: proc.rotate(0.3, axis, points[0]), 1000),
+        ('QuatProc.rotate_many[64]', lambda: proc.rotate_many(0.3, axis, points), 1000),
+    ]
+    for array_type, num_mics in [('ULA', 4), ('ULA', 32), ('CUA', 4), ('CUA', 32), ('SUA', 4), ('SUA', 32)]:
+        func = getattr(ArrayStructures, array_type)
+        cases.append(('ArrayStructures.{}[{}]'.format(array_type, num_mics), lambda func=func, num_mics=num_mics: func(0.05, num_mics), 100))
+    cases += [
+        ('sample_sphere_uniformly_stochastic[1000]', lambda: [UniformSphericalSampling.sample_sphere_uniformly_stochastic() for _ in range(1000)], 10),
+        ('sample_sphere_uniformly_stochastic_batch[1000]', lambda: UniformSphericalSampling.sample_sphere_uniformly_stochastic_batch(1000, rng), 10),
+    ]
+    offsets = ArrayStructures.CUA(0.05, 8)
+    source_vec_off = np.array([[1.5, 0., 0.]])
+    cases += [
+        ('placement.loop', lambda: placement_loop(ROOM, offsets, source_vec_off, rng), 100),
+        ('placement.sample_placement', lambda: sample_placement(ROOM, offsets, source_vec_off, rng=rng), 100),
+    ]
+    T60s = [0.2] if quick else [0.2, 0.5]
+    for array_type, dist in MICS.items():
+        for T60 in T60s:
+            for num_mics in [4, 8]:
+                cases.append(('generate_rir.{}[T60={},mics={}]'.format(array_type, T60, num_mics),
+                              lambda array_type=array_type, dist=dist, T60=T60, num_mics=num_mics:
+                              generate_rir(0.5, 0.2, 1.5, ROOM, T60, dist, num_mics, array_type, backend=backend, rng=rng), 1))
+    # one configuration of 37 DOAs with 4 microphones and a T60 of 0.5 s
+    data = {'RIR': rng.standard_normal((37, int(0.5*rate), 4)), 'Dist': 0.05, 'Vecs': list(rng.standard_normal((37, 3))),
+            'DirectRIR': rng.standard_normal((37, int(0.5*rate), 4))}
+    outfile = os.path.join(tmpdir, 'benchmark.pickle')
+    def stream():
+        with PickleStreamWriter(outfile, len(data['Vecs']), data['Dist']) as writer:
+            for vec, rir, dirrir in zip(data['Vecs'], data['RIR'], data['DirectRIR']):
+                writer.append(vec, rir, dirrir)
+    encoded = RIRCodec.encode(data['RIR'][0])
+    signals = rng.standard_normal((4, rate))
+    cases += [
+        ('write', lambda: write(data, outfile), 1),
+        ('PickleStreamWriter', stream, 1),
+        ('RIRCodec.encode', lambda: RIRCodec.encode(data['RIR'][0]), 10),
+        ('RIRCodec.decode', lambda: RIRCodec.decode(encoded), 10),
+        ('Convolution.convolve[4x1s]', lambda: convolve(signals, data['RIR'][0]), 10),
+    ]
+    return cases
+
+def environment(backend):
+    """
+    :return: versions and machine the benchmark ran on
+    :rtype: dict
+    """
+    env = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+           'processor': platform.processor(), 'cpus': os.cpu_count(), 'backend': backend,
+           'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    try:
+        from importlib.metadata import version
+        env['rir_generator'] = version('rir-generator')
+    except Exception:
+        env['rir_generator'] = None
+    return env
+
+def compare(results, baseline, tolerance):
+    """Function that compares the median timings against a baseline
+
+    :param results: (dict) timings of this run by case name
+    :param baseline: (dict) timings of the baseline by case name
+    :param tolerance: (float) allowed relative slowdown, e.g. 0.2 for 20 %
+    :return: names of the cases that are slower than the baseline by more than the tolerance
+    :rtype: list
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            print('{:<45} {:>12.6f} s   (not in baseline)'.format(name, result['median']))
+            continue
+        ratio = result['median']/baseline[name]['median']
+        status = 'REGRESSION' if ratio > 1 + tolerance else ''
+        print('{:<45} {:>12.6f} s {:>8.2f}x {}'.format(name, result['median'], ratio, status))
+        if status:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', default=None, help='JSON file the results are written to')
+    parser.add_argument('--baseline', default=None, help='JSON file of an earlier run to compare against, exits with 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown against the baseline')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timings per case')
+    parser.add_argument('--filter', default='', help='only run cases whose name contains this string')
+    parser.add_argument('--backend', default=backend, help='backend of the generate_rir cases')
+    parser.add_argument('--quick', action='store_true', help='only the short generate_rir configurations')
+    args = parser.parse_args()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, func, number in get_cases(tmpdir, args.backend, args.quick):
+            if args.filter not in name:
+                continue
+            results[name] = measure(func, args.repeat, number)
+            print('{:<45} {:>12.6f} s'.format(name, results[name]['median']))
+    report = {'environment': environment(args.backend), 'results': results}
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print('\ncompared to {} ({})'.format(args.baseline, baseline['environment']['date']))
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print('{} of {} cases slower than the baseline by more than {:.0%}'.format(len(regressions), len(results), args.tolerance))
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Report compression ratio, error and decode throughput of helper/RIRCodec.py on written configurations, or convert uncompressed pickles to the 'codec' storage
+"""
+import os
+import glob
+import time
+import pickle
+import argparse
+import numpy as np
+from helper import RIRCodec
+from helper.StreamWriter import CodecStreamWriter
+from config.config import codec_bits, codec_early, codec_chunk, rate
+
+def blocks(data, key):
+    """
+    :return: the DOA blocks of an uncompressed pickle, cut to their lengths
+    :rtype: list of arrays
+    """
+    lengths = data.get('Length', [data[key].shape[1]]*len(data[key]))
+    return [block[:length] for block, length in zip(data[key], lengths)]
+
+def report(filename, bits=codec_bits, early=int(codec_early*rate), chunk=codec_chunk):
+    """Function that measures the codec on one configuration, uncompressed pickles are encoded with the given parameters first
+
+    :param filename: (str) pickle file written by RIR_write_quaternion
+    :return: dict with the raw and encoded size in bytes, the compression ratio, the maximal absolute error (None for already encoded files) and the decode throughput in MB/s of raw data
+    :rtype: dict
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    if 'Codec' in data:
+        encoded, raw = data['RIR'], None
+    else:
+        raw = blocks(data, 'RIR')
+        encoded = [RIRCodec.encode(block, bits, early, chunk) for block in raw]
+    start = time.perf_counter()
+    decoded = [RIRCodec.decode(block) for block in encoded]
+    duration = time.perf_counter() - start
+    raw_size = sum(block.nbytes for block in decoded)
+    enc_size = sum(len(block) for block in encoded)
+    return {'file': filename, 'raw': raw_size, 'encoded': enc_size, 'ratio': raw_size/enc_size,
+            'max_error': None if raw is None else max(float(np.abs(a - b).max()) for a, b in zip(raw, decoded)),
+            'decode_MBps': raw_size/duration/1e6}
+
+def convert(filename, outfile, bits=codec_bits, early=int(codec_early*rate), chunk=codec_chunk):
+    """Function that writes an uncompressed configuration pickle in the 'codec' storage
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    sparse = not isinstance(data['DirectRIR'], np.ndarray)
+    direct = data['DirectRIR'] if sparse else blocks(data, 'DirectRIR')
+    with CodecStreamWriter(outfile, len(data['Vecs']), data['Dist'], sparse, bits, early, chunk) as writer:
+        for vec, rir, dirrir in zip(data['Vecs'], blocks(data, 'RIR'), direct):
+            writer.append(vec, rir, dirrir)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=['report', 'convert'])
+    parser.add_argument('files', nargs='+', help='pickle files or directories of pickle files')
+    parser.add_argument('--output', default=None, help='directory of the converted files')
+    parser.add_argument('--bits', type=int, default=codec_bits, help='bit depth of the quantization')
+    args = parser.parse_args()
+    files = []
+    for path in args.files:
+        files += sorted(glob.glob(os.path.join(path, '*.pickle'))) if os.path.isdir(path) else [path]
+    if args.command == 'convert':
+        if args.output is None:
+            parser.error('convert needs --output')
+        os.makedirs(args.output, exist_ok=True)
+        for filename in files:
+            convert(filename, os.path.join(args.output, os.path.basename(filename)), args.bits)
+            print(filename)
+        return
+    results = [report(filename, args.bits) for filename in files]
+    for result in results:
+        print('{file}: ratio {ratio:.2f}, max error {max_error}, decode {decode_MBps:.0f} MB/s'.format(**result))
+    raw, enc = sum(r['raw'] for r in results), sum(r['encoded'] for r in results)
+    print('total: {:.1f} MB -> {:.1f} MB, ratio {:.2f}'.format(raw/1e6, enc/1e6, raw/enc))
+
+if __name__ == '__main__':
+    main()
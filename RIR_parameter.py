@@ -1,13 +1,103 @@
 import os
 import argparse
 import importlib
-from config.config import * 
+from collections import namedtuple
+import numpy as np
+from helper.Scheduler import CostModel, plan, makespan, output_size
+from helper.Instrumentation import read_records
+from config.config import *
 
-if __name__ == '__main__':
-    os.makedirs('./'+data_path, exist_ok=True)
+# one configuration of the parameter grid, the fields are the arguments of RIR_write_quaternion.simulate, doas restricts a job to a part 'start:stop' of the DOAs of its configuration
+Job = namedtuple('Job', ['roomx', 'roomy', 'roomz', 'j', 'ReverberationTime', 'dist', 'path', 'array_type', 'num_mics', 'indx', 'DOA_count', 'seed', 'doas'], defaults=[None])
+
+def get_jobs(seed=seed):
+    """Function that expands the parameter grid of config/config.py into jobs. Every job gets its own seed derived from the root seed with np.random.SeedSequence
+
+    :param seed: (int) root seed of the whole grid
+    :return: list of all configurations
+    :rtype: list of Job
+    """
+    jobs = []
     Number_of_Rooms = len(rooms)
+    # jobs that share their placements across reverberation times get the list of all reverberation times
+    revTimes = [list(reverberationtimes)] if share_placement_across_t60 else reverberationtimes
     for r in range(Number_of_Rooms):
         for s_a_dist in source_array_dist:
-            for revTime in reverberationtimes:
+            for revTime in revTimes:
                 for i in range(reps):
-                    print(str(rooms[r][0]),str(rooms[r][1]),str(rooms[r][2]), str(s_a_dist), str(revTime),str(dmic), data_path,array_type,str(num_mics),str(i), doa_count)
+                    jobs.append(Job(rooms[r][0], rooms[r][1], rooms[r][2], s_a_dist, revTime, dmic, data_path, array_type, num_mics, i, doa_count, None))
+    seeds = np.random.SeedSequence(seed).spawn(len(jobs))
+    return [job._replace(seed=int(ss.generate_state(1, np.uint64)[0])) for job, ss in zip(jobs, seeds)]
+
+def get_cost_model():
+    """Function that returns the cost model of the jobs, calibrated with the records of stats_file if there are enough of them
+
+    :rtype: helper.Scheduler.CostModel
+    """
+    model = CostModel(rate=rate, c=c, mixing_time=hybrid_mixing_time)
+    if stats_file is not None:
+        model.fit(read_records(stats_file))
+    return model
+
+def get_doa_counts(jobs):
+    """
+    :return: number of DOAs of the configuration of every job
+    :rtype: list of int
+    """
+    from RIR_write_quaternion import get_doas
+    return [len(get_doas(job.array_type, int(job.DOA_count))[0]) for job in jobs]
+
+def schedule(jobs, workers=num_workers, parts_per_worker=schedule_parts_per_worker, model=None):
+    """Function that orders jobs longest-first by their estimated cost and splits the jobs that would keep workers idle at the end of the sweep into parts of their DOAs. The parts of a configuration are merged by the last of them, see RIR_write_quaternion.merge_parts. Jobs of the 'shards' storage and jobs with shared placements, whose placements depend on the DOAs of the job, are only ordered
+
+    :param jobs: (list of Job) configurations
+    :param workers: (int) number of workers, 0 uses all cores
+    :param parts_per_worker: (int) see helper.Scheduler.plan
+    :param model: (helper.Scheduler.CostModel) cost model, calibrated with stats_file if None
+    :return: Tuple of the jobs with their DOA ranges in the order they should be started and their estimated costs in seconds
+    :rtype: Tuple
+    """
+    from RIR_write_quaternion import parse_reverberation_times
+    model = get_cost_model() if model is None else model
+    def cost(job, doa_count):
+        return model.predict([float(job.roomx), float(job.roomy), float(job.roomz)], parse_reverberation_times(job.ReverberationTime), int(job.num_mics), doa_count)
+    tasks = plan(jobs, cost, get_doa_counts(jobs), workers or os.cpu_count(), parts_per_worker, splittable=storage != 'shards' and not shared_placement)
+    return [job._replace(doas=None if doas is None else '{}:{}'.format(*doas)) for job, doas, _ in tasks], [task_cost for *_, task_cost in tasks]
+
+def dry_run(jobs, workers=num_workers, parts_per_worker=schedule_parts_per_worker):
+    """Function that prints the estimated CPU time, the projected wall time of the sweep in grid order and scheduled, and the size of its output
+
+    :param jobs: (list of Job) configurations of the whole grid
+    :param workers: (int) number of workers, 0 uses all cores
+    """
+    from RIR_write_quaternion import parse_reverberation_times
+    workers = workers or os.cpu_count()
+    model = get_cost_model()
+    doa_counts = get_doa_counts(jobs)
+    costs = [model.predict([float(job.roomx), float(job.roomy), float(job.roomz)], parse_reverberation_times(job.ReverberationTime), int(job.num_mics), doa_count)
+             for job, doa_count in zip(jobs, doa_counts)]
+    scheduled, scheduled_costs = schedule(jobs, workers, parts_per_worker, model)
+    size = sum(output_size(parse_reverberation_times(job.ReverberationTime), int(job.num_mics), doa_count, rate, np.dtype(output_dtype).itemsize, sparse_direct)
+               for job, doa_count in zip(jobs, doa_counts))
+    print('cost model: {}'.format('calibrated with {} jobs of {}'.format(model.calibrated, stats_file) if model.calibrated else 'uncalibrated defaults, set stats_file to calibrate'))
+    print('jobs: {} configurations, {} scheduled jobs after splitting'.format(len(jobs), len(scheduled)))
+    print('CPU time: {:.0f} s, longest job {:.0f} s, longest scheduled job {:.0f} s'.format(sum(costs), max(costs), max(scheduled_costs)))
+    print('wall time on {} workers: {:.0f} s in grid order, {:.0f} s scheduled (lower bound {:.0f} s)'.format(
+        workers, makespan(costs, workers), makespan(scheduled_costs, workers), max(sum(costs)/workers, max(scheduled_costs))))
+    print('output: at most {:.2f} GB{}'.format(size/1e9, ' before compression' if storage == 'codec' else ''))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print the jobs of the parameter grid of config/config.py, one line of arguments of RIR_write_quaternion.py per job')
+    parser.add_argument('--schedule', action='store_true', help='print the jobs longest-first and split at DOA granularity, see schedule')
+    parser.add_argument('--dry-run', action='store_true', help='print the projected wall time and output size of the grid instead of the jobs')
+    parser.add_argument('--workers', type=int, default=num_workers, help='number of workers the jobs are scheduled for, 0 uses all cores')
+    args = parser.parse_args()
+    jobs = get_jobs()
+    if args.dry_run:
+        dry_run(jobs, args.workers)
+        exit()
+    os.makedirs('./'+data_path, exist_ok=True)
+    if args.schedule:
+        jobs, _ = schedule(jobs, args.workers)
+    for job in jobs:
+        print(*[','.join(map(str, arg)) if isinstance(arg, list) else str(arg) for arg in job])
@@ -0,0 +1,115 @@
+"""Compute all configurations of config/config.py on a pool of persistent worker processes, replacing the RIR_parameter.py | parallel pipeline of gen_rirs.sh
+"""
+import os
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from RIR_parameter import Job, get_jobs, schedule, dry_run
+from helper.Manifest import write_manifest, read_manifest, checksum, record_done, completed
+from helper.ShardStore import ShardReader
+from config.config import num_workers, data_path, storage
+
+def init_worker():
+    """Function that imports the simulation once per worker process, so that every job afterwards runs in a warm interpreter
+    """
+    global simulate
+    from RIR_write_quaternion import simulate
+
+def run_job(job):
+    """Function that computes one configuration and isolates its failure from the other jobs
+
+    :param job: configuration to compute
+    :type job: Job
+    :return: Tuple of the job, the list of written file names with their checksums (None on failure) and the formatted exception (None on success)
+    :rtype: Tuple
+    """
+    try:
+        filenames = simulate(*job)
+        filenames = filenames if isinstance(filenames, list) else [filenames]
+        # blocks in shards carry their own checksums in the index of the store
+        return job, [(filename, checksum(filename) if os.path.isfile(filename) else None) for filename in filenames], None
+    except Exception:
+        return job, None, traceback.format_exc()
+
+def run(jobs, workers=num_workers, chunksize=1, done_file=None):
+    """Function that runs jobs on a process pool
+
+    :param jobs: (list of Job) configurations to compute
+    :param workers: (int) number of worker processes, 0 uses all cores
+    :param chunksize: (int) number of jobs sent to a worker at once
+    :param done_file: (str) completion log of the manifest that finished files are recorded in
+    :return: list of failed jobs with their formatted exceptions
+    :rtype: list
+    """
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=init_worker) as executor:
+        for cnt, (job, outputs, error) in enumerate(executor.map(run_job, jobs, chunksize=chunksize)):
+            if error is None:
+                for filename, sha256 in outputs:
+                    print('[{}/{}] {}'.format(cnt + 1, len(jobs), filename))
+                    if done_file is not None and sha256 is not None:
+                        record_done(done_file, filename, sha256)
+            else:
+                print('[{}/{}] failed {}\n{}'.format(cnt + 1, len(jobs), job, error))
+                failed.append((job, error))
+    return failed
+
+def merge_pending(jobs, done_file=None):
+    """Function that merges the configurations whose parts are all complete but were not merged, e.g. because a merge was killed
+
+    :param jobs: (list of Job) jobs of the sweep
+    :param done_file: (str) completion log of the manifest that merged files are recorded in
+    """
+    from RIR_write_quaternion import get_doas, get_filenames, merge_parts
+    for job in set(job._replace(doas=None) for job in jobs if job.doas is not None):
+        doa_total = len(get_doas(job.array_type, int(job.DOA_count))[0])
+        for filename in get_filenames(*job):
+            if not os.path.exists(filename) and merge_parts(filename, doa_total, force=True):
+                print('merged {}'.format(filename))
+                if done_file is not None:
+                    record_done(done_file, filename, checksum(filename))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=num_workers, help='number of worker processes, 0 uses all cores')
+    parser.add_argument('--chunksize', type=int, default=1, help='number of jobs sent to a worker at once')
+    parser.add_argument('--resume', action='store_true', help='continue the sweep of the existing manifest and skip the complete outputs')
+    parser.add_argument('--schedule', action='store_true', help='start the jobs longest-first by their estimated cost and split stragglers at DOA granularity, see RIR_parameter.schedule')
+    parser.add_argument('--dry-run', action='store_true', help='print the projected wall time and output size of the sweep and exit')
+    args = parser.parse_args()
+    if args.dry_run:
+        dry_run(get_jobs(), args.workers)
+        return
+    os.makedirs(data_path, exist_ok=True)
+    manifest = os.path.join(data_path, 'manifest.jsonl')
+    done_file = os.path.join(data_path, 'manifest.done.jsonl')
+    if args.resume and os.path.exists(manifest):
+        from RIR_write_quaternion import get_filenames
+        jobs = [Job(**entry) for entry in read_manifest(manifest)]
+        if storage == 'shards':
+            done = set(ShardReader(os.path.join(data_path, 'shards')).index['seed'])
+            todo = [job for job in jobs if job.seed not in done]
+        else:
+            done = completed(done_file)
+            # a part is also complete if its configuration was merged
+            todo = [job for job in jobs if not set(get_filenames(*job)) <= done and not set(get_filenames(*job._replace(doas=None))) <= done]
+        print('resuming {}: {} of {} jobs complete'.format(manifest, len(jobs) - len(todo), len(jobs)))
+    else:
+        jobs = get_jobs()
+        if args.schedule:
+            jobs, _ = schedule(jobs, args.workers)
+        write_manifest(jobs, manifest)
+        if os.path.exists(done_file):
+            os.remove(done_file)
+        todo = jobs
+    for path in set(job.path for job in todo):
+        os.makedirs(path, exist_ok=True)
+    failed = run(todo, args.workers, args.chunksize, done_file)
+    if storage != 'shards':
+        merge_pending(jobs, done_file)
+    if failed:
+        print('{} of {} jobs failed'.format(len(failed), len(todo)))
+        exit(1)
+
+if __name__ == '__main__':
+    main()
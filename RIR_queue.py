@@ -0,0 +1,54 @@
+"""Compute the configurations of config/config.py on several nodes that share a queue directory: 'init' fills the queue once, 'work' runs local workers on every node until the queue is empty
+"""
+import os
+import json
+import argparse
+from multiprocessing import Process
+from RIR_parameter import get_jobs, schedule
+from helper.WorkQueue import WorkQueue, work
+from config.config import data_path, queue_dir, heartbeat_interval, stale_timeout, num_workers
+
+def run_worker(path, worker):
+    """Function that runs one local worker until the queue is empty
+
+    :param path: (str) directory of the queue
+    :param worker: (int) number of the worker on this node
+    """
+    from RIR_write_quaternion import simulate
+    queue = WorkQueue(path, heartbeat_interval, stale_timeout)
+    done, failed = work(queue, simulate)
+    print('worker {} (pid {}): {} jobs done, {} failed'.format(worker, os.getpid(), done, failed))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=['init', 'work', 'status', 'requeue-failed'])
+    parser.add_argument('--queue', default=queue_dir or os.path.join(data_path, 'queue'), help='queue directory on the shared filesystem')
+    parser.add_argument('--workers', type=int, default=num_workers, help='number of local worker processes, 0 uses all cores')
+    parser.add_argument('--schedule', action='store_true', help='init: queue the jobs longest-first by their estimated cost and split stragglers at DOA granularity, see RIR_parameter.schedule')
+    args = parser.parse_args()
+    queue = WorkQueue(args.queue, heartbeat_interval, stale_timeout)
+    if args.command == 'init':
+        jobs = get_jobs()
+        if args.schedule:
+            # the parts are sized for --workers, which should count the workers of all nodes here
+            jobs, _ = schedule(jobs, args.workers)
+        for path in set(job.path for job in jobs):
+            os.makedirs(path, exist_ok=True)
+        added = queue.put([job._asdict() for job in jobs])
+        print('{} of {} jobs added to {}'.format(added, len(jobs), args.queue))
+    elif args.command == 'work':
+        workers = [Process(target=run_worker, args=(args.queue, cnt)) for cnt in range(args.workers or os.cpu_count())]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    elif args.command == 'requeue-failed':
+        print('{} failed jobs re-queued'.format(len(queue.requeue_failed())))
+    print(json.dumps(queue.status()))
+    for host, stats in queue.throughput().items():
+        print('{}: {} jobs on {} workers, {:.1f} s busy, {:.3f} jobs/s'.format(host, stats['jobs'], stats['workers'], stats['busy'], stats['jobs_per_s'] or 0))
+    if args.command == 'work' and queue.status()['failed']:
+        exit(1)
+
+if __name__ == '__main__':
+    main()
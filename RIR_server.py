@@ -0,0 +1,64 @@
+"""Local generation server for interactive use: 'serve' keeps worker processes with imported modules, backends and caches warm and answers generate_rir requests on a Unix domain socket, 'stats' prints queue depth and latency percentiles, 'stop' shuts the server down. Clients use helper.RIRServer.RIRClient, e.g.
+
+    with RIRClient(socket_path()) as client:
+        vec, RIRs, dirRIRs = client.generate_rir(0.5, 0.1, 1.0, [6, 5, 3], 0.3, 0.05, 6, 'CUA', seed=0)
+"""
+import os
+import sys
+import json
+import signal
+import tempfile
+import argparse
+import numpy as np
+from helper.RIRServer import RIRServer, RIRClient
+from config.config import server_socket, server_workers
+
+def socket_path():
+    """
+    :return: (str) path of the socket of the server in config/config.py
+    """
+    return server_socket or os.path.join(tempfile.gettempdir(), 'RIR_server.sock')
+
+def generate(*args, seed=None, **kwargs):
+    """Function that runs RIR_write_quaternion.generate_rir in a worker of the server
+
+    :param seed: (int) seed of the random number generator of the placement, a fresh one if None
+    """
+    from RIR_write_quaternion import generate_rir
+    # the room of a request may be a list
+    if 'Room' in kwargs:
+        kwargs['Room'] = np.asarray(kwargs['Room'])
+    elif len(args) > 3:
+        args = tuple(args[:3]) + (np.asarray(args[3]),) + tuple(args[4:])
+    rng = np.random.default_rng(seed) if seed is not None else None
+    return generate_rir(*args, rng=rng, **kwargs)
+
+def warm_up():
+    """Function that every worker runs once, it imports the backend and fills the geometry caches of a small request
+    """
+    generate(0., 0., 1., [6, 5, 3], 0.3, 0.05, 4, 'CUA', seed=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'stats', 'stop'])
+    parser.add_argument('--socket', default=socket_path(), help='path of the Unix domain socket')
+    parser.add_argument('--workers', type=int, default=server_workers, help='number of worker processes, 0 uses all cores')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = RIRServer(args.socket, generate, args.workers, warm_up)
+        # SIGTERM removes the socket and unread results like Ctrl-C
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        print('serving on {} with {} workers'.format(args.socket, server.workers))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+    with RIRClient(args.socket) as client:
+        if args.command == 'stats':
+            print(json.dumps(client.stats(), indent=1))
+        else:
+            client.shutdown()
+
+if __name__ == '__main__':
+    main()
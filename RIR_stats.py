@@ -0,0 +1,46 @@
+"""Roll the per-job records of config.stats_file up into stage times, throughput and the estimated remaining time of a sweep
+"""
+import os
+import json
+import argparse
+from helper.Instrumentation import read_records, aggregate
+from helper.Manifest import read_manifest
+from config.config import stats_file, data_path
+
+def format_summary(summary):
+    """
+    :param summary: (dict) result of helper.Instrumentation.aggregate
+    :return: human readable summary
+    :rtype: str
+    """
+    lines = ['jobs: {} done, {} failed{}'.format(summary['jobs_done'], summary['jobs_failed'],
+                                                 ' of {}'.format(summary['jobs_total']) if 'jobs_total' in summary else '')]
+    total = sum(summary['stages'].values())
+    for name, value in sorted(summary['stages'].items(), key=lambda item: -item[1]):
+        lines.append('  {:<15} {:>10.1f} s {:>6.1%}'.format(name, value, value/total if total else 0))
+    for name, value in summary['counters'].items():
+        lines.append('  {:<20} {:>14}'.format(name, value))
+    if summary.get('jobs_per_s'):
+        lines.append('throughput: {:.3f} jobs/s on {} workers, {:.1f} DOAs/s, {:.2f} MB/s'.format(
+            summary['jobs_per_s'], summary['workers'], summary['throughput'].get('doas', 0), summary['throughput'].get('bytes_written', 0)/1e6))
+    if summary.get('eta') is not None:
+        lines.append('ETA: {:.0f} s'.format(summary['eta']))
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('stats_file', nargs='?', default=stats_file, help='JSON lines file of the job records')
+    parser.add_argument('--total', type=int, default=None, help='number of jobs of the sweep, read from the manifest of RIR_pool.py if not given')
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+    if args.stats_file is None:
+        parser.error('no stats file given and config.stats_file is None')
+    total = args.total
+    manifest = os.path.join(data_path, 'manifest.jsonl')
+    if total is None and os.path.exists(manifest):
+        total = len(read_manifest(manifest))
+    summary = aggregate(read_records(args.stats_file), total)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,40 @@
-
-import rir_generator as pyrir
+import os
+import re
+import glob
 import pickle
 import sys
+from contextlib import ExitStack
+from functools import partial
 import numpy as np
-from helper import ArrayStructures
-from helper.UniformSphericalSampling import sample_sphere_uniformly_geometric as ssug
-from helper.UniformSphericalSampling import sample_halfsphere_uniformly_geometric as shug
+from helper import GeometryCache, Instrumentation, ImageSource, LateReverb, Decay, DirectPath, Backends, Quaternions, ArrayStructures, UniformSphericalSampling, platonic_solids
+from helper.GeometryCache import array_geometry, sampling_grid
 from helper.Quaternions import QuatProc
-from config.config import c, rate, wdist
+from helper.DirectPath import direct_path, densify_direct_path
+from helper.StreamWriter import PickleStreamWriter, ShardStreamWriter, CodecStreamWriter, BackgroundWriter
+from helper.Backends import get_backend, backend_versions
+from helper.RIRCache import RIRCache, cached, source_version
+from helper.Decay import decay_length
+from helper.LateReverb import extend_late_reverb
+from config.config import c, rate, wdist, sparse_direct, placement_batch, max_placement_attempts, backend, storage, shard_size, geometry_cache_dir, output_dtype, decay_threshold, stats_file, shared_placement, hybrid_mixing_time, hybrid_order, rir_cache_dir, rir_cache_size, codec_bits, codec_early, codec_chunk, write_queue_size
 
 proc = QuatProc()
+GeometryCache.set_cache_dir(geometry_cache_dir)
+# cache of the results of generate_rir, disabled if None
+rir_cache = RIRCache(rir_cache_dir, rir_cache_size) if rir_cache_dir is not None else None
+
+def cache_context():
+    """Function that returns everything besides its arguments the result of generate_rir depends on, see helper.RIRCache.cached. The sources of this script and of the modules of the synthesis and of the array geometries are part of it, so changed code never reads results of the old code
+    """
+    code = source_version(sys.modules[__name__], ImageSource, LateReverb, Decay, DirectPath, Backends, Quaternions,
+                          GeometryCache, ArrayStructures, UniformSphericalSampling, platonic_solids)
+    return (c, rate, wdist, placement_batch, max_placement_attempts, hybrid_order, backend_versions(), code)
 
-def sample_room(room,wdist=wdist):
+def sample_room(room,wdist=wdist, rng=None):
     """Function that samples a square room uniformly. The sample has to be within a certain distance to the wall
 
     :param room: (array) x,y,z room dimensions
     :param wdist: (float) minimal distance to walls of the sampling point
+    :param rng: (np.random.Generator) random number generator, a fresh one if None
 
     :return: (array) x,y,z sampled room position
     :rtype: float array
@@ -24,7 +43,9 @@ def sample_room(room,wdist=wdist):
     if (sample_area<0).any():
         print('room too small to sample!')
         return
-    pos = np.random.rand(3)*sample_area + wdist
+    if rng is None:
+        rng = np.random.default_rng()
+    pos = rng.random(3)*sample_area + wdist
     return pos
 
 def write(data, outfile):
@@ -51,6 +72,92 @@ def verify_positions(room, a,b,wdist = wdist):
         return False
     return True
 
+def sample_placement(room, offsets, source_vec_off, wdist=wdist, batch_size=placement_batch, max_attempts=max_placement_attempts, rng=None):
+    """Function that samples a random position and rotation of array and source such that all of them keep the minimal distance to the walls. Candidate (center, axis, angle) triples are drawn and validated in batches, the first valid one is used so the result is distributed as with sampling one candidate at a time
+
+    :param room: (array) x,y,z room dimensions
+    :param offsets: (array) microphone offsets to the array center of shape (M, 3)
+    :param source_vec_off: (array) vector(s) from array center to the source of shape (S, 3)
+    :param wdist: (float) minimal distance of microphones and source to the walls
+    :param batch_size: (int) number of candidates validated at once
+    :param max_attempts: (int) number of candidates after which the sampling is given up
+    :param rng: (np.random.Generator) random number generator, a fresh one if None
+
+    :return: Tuple of microphone positions (M, 3), source positions (S, 3) and a dict with the number of 'attempts' and the 'acceptance_rate' of all validated candidates
+    :rtype: Tuple
+    """
+    sample_area = room - 2*wdist
+    points = np.concatenate([offsets, source_vec_off], axis=0)
+    # the rotated points span the same distances as before, so they cannot fit if their diameter exceeds the sampling box
+    diameter = np.max(np.linalg.norm(points[None,...] - points[:,None,...], axis=-1))
+    if (sample_area < 0).any() or diameter > np.linalg.norm(sample_area):
+        raise ValueError('array and source (diameter {:.2f} m) do not fit in room {} with wall distance {}'.format(diameter, room, wdist))
+    if rng is None:
+        rng = np.random.default_rng()
+    attempts = 0
+    while attempts < max_attempts:
+        num = min(batch_size, max_attempts - attempts)
+        centers = rng.random((num, 3))*sample_area + wdist
+        # random rotation axes (normally distributed) and uniformly distributed angles
+        rv = rng.standard_normal((num, 3))
+        rangle = rng.random(num)*2*np.pi
+        with Instrumentation.stage('rotation'):
+            cands = centers[:,None,:] + proc.rotate_many(rangle, rv, points)
+        valid = ((cands <= room - wdist) & (cands >= wdist)).all(axis=(-1, -2))
+        # the acceptance rate of a job is placement_valid over placement_candidates
+        Instrumentation.count('placement_candidates', num)
+        Instrumentation.count('placement_valid', int(valid.sum()))
+        if valid.any():
+            idx = np.argmax(valid)
+            # all earlier batches were rejected, the rate is over all validated candidates
+            stats = {'attempts': int(attempts + idx + 1), 'acceptance_rate': float(valid.sum()/(attempts + num))}
+            Instrumentation.count('placement_attempts', stats['attempts'])
+            Instrumentation.count('placement_rejections', stats['attempts'] - 1)
+            return cands[idx,:offsets.shape[0]], cands[idx,offsets.shape[0]:], stats
+        attempts += num
+    Instrumentation.count('placement_attempts', attempts)
+    Instrumentation.count('placement_rejections', attempts)
+    raise RuntimeError('no valid placement of array and source in room {} with wall distance {} after {} attempts, reduce the source-array distance or the array size'.format(room, wdist, attempts))
+
+def sample_shared_placement(room, offsets, source_vec_offs, wdist=wdist, batch_size=placement_batch, max_attempts=max_placement_attempts, rng=None):
+    """Function that samples one position and rotation of the array that serves as many DOAs as possible. Of every batch of candidates the one with a valid array and the most valid sources is used. This selection is biased: placements near the room center serve more DOAs, so the array positions are not uniformly distributed in the room as with sample_placement
+
+    :param room: (array) x,y,z room dimensions
+    :param offsets: (array) microphone offsets to the array center of shape (M, 3)
+    :param source_vec_offs: (array) vectors from array center to the sources of all DOAs of shape (D, 3)
+    :param wdist: (float) minimal distance of microphones and sources to the walls
+    :param batch_size: (int) number of candidates validated at once
+    :param max_attempts: (int) number of candidates after which the sampling is given up
+    :param rng: (np.random.Generator) random number generator, a fresh one if None
+
+    :return: Tuple of microphone positions (M, 3), source positions (D, 3), a boolean mask of the DOAs whose source is valid and a dict with the number of 'attempts' and the number of 'served' DOAs
+    :rtype: Tuple
+    """
+    sample_area = room - 2*wdist
+    if (sample_area < 0).any():
+        raise ValueError('room {} too small for wall distance {}'.format(room, wdist))
+    if rng is None:
+        rng = np.random.default_rng()
+    points = np.concatenate([offsets, source_vec_offs], axis=0)
+    num_mics = offsets.shape[0]
+    attempts = 0
+    while attempts < max_attempts:
+        num = min(batch_size, max_attempts - attempts)
+        centers = rng.random((num, 3))*sample_area + wdist
+        rv = rng.standard_normal((num, 3))
+        rangle = rng.random(num)*2*np.pi
+        with Instrumentation.stage('rotation'):
+            cands = centers[:,None,:] + proc.rotate_many(rangle, rv, points)
+        valid = ((cands <= room - wdist) & (cands >= wdist)).all(axis=-1)
+        served = valid[:,num_mics:].sum(axis=-1)*valid[:,:num_mics].all(axis=-1)
+        attempts += num
+        if served.any():
+            idx = np.argmax(served)
+            Instrumentation.count('placement_attempts', attempts)
+            return cands[idx,:num_mics], cands[idx,num_mics:], valid[idx,num_mics:], {'attempts': attempts, 'served': int(served[idx])}
+    Instrumentation.count('placement_attempts', attempts)
+    raise RuntimeError('no placement of the array with a valid source in room {} with wall distance {} after {} attempts'.format(room, wdist, attempts))
+
 def verify_DOA(mics, sourcevecoff, doa):
     """Function that raises an internal error if array or microphone is out of the room or too close to the wall
 
@@ -90,74 +197,255 @@ def generate_source_vec(sad,Az, El):
     source = proc.rotate(Az,rotaxz,source)
     return source*sad
 
-def generate_rir(Azimuth, Elevation, source_array_dist, Room, ReverberationTime, dist,num_mics,array_type):
+@cached(lambda: rir_cache, cache_context)
+def generate_rir(Azimuth, Elevation, source_array_dist, Room, ReverberationTime, dist,num_mics,array_type, sparse_direct=False, backend=backend, rng=None, dtype=output_dtype, decay_threshold=decay_threshold, mixing_time=hybrid_mixing_time):
     """Function that generates 'M' room impulse responses for a given 'DOA'. Array and source are randomly positionend and rotated in a room using quaternions.
 
     :param Azimuth: (float) Azimuth angle of the source to the array center in rad
     :param Elevation: (float) Elevation angle of the source to the array center in rad
     :param source_array_dist: (float) distance of source signal to array center
     :param Room: (array) x, y, z dimension of room
-    :param ReverberationTime: (float) Reverberation time of the current room
+    :param ReverberationTime: (float or list of floats) Reverberation time of the current room, for a list all reverberation times share the placement and the image source geometry
     :param dist: (float) intermicrophone distance for ULA or radius for CUA
     :param num\_mics: (int) number of microphones
     :param array\_type: (str) one of ULA, CUA, SUA
-
-    :return: Tuple of a unit-norm vector pointing from array to source and an array of room impulse responses
+    :param sparse\_direct: (bool) return the direct path as (delay, gain, kernel) dict instead of dense impulse responses
+    :param backend: (str) name of the backend that computes the room impulse responses, see helper.Backends
+    :param rng: (np.random.Generator) random number generator for the placement, a fresh one if None
+    :param dtype: dtype of the returned impulse responses
+    :param decay_threshold: (float) energy decay in dB at which the impulse responses are truncated, see helper.Decay.decay_length, full length if None
+    :param mixing_time: (float) time in seconds after which the image sources are replaced by a stochastic late tail, see synthesize, all image sources if None
+
+    :return: Tuple of a unit-norm vector pointing from array to source, an array of room impulse responses and the direct path impulse responses (lists with one entry per reverberation time if ReverberationTime is a list)
     :rtype: Tuple
     """
-    # compute mic poses in room
-    count = 0
+    with Instrumentation.stage('geometry'):
+        offsets = array_geometry(array_type, dist, num_mics)
+        source_vec_off = generate_source_vec(source_array_dist, Azimuth, Elevation)[None,...]
+
+    # randomly rotate array and source and place them in the room
+    with Instrumentation.stage('placement'):
+        Mics, source_vec, _ = sample_placement(Room, offsets, source_vec_off, rng=rng)
+    source_vec = source_vec[0]
+    # all microphones share the image lattice of the source, so compute the (nsample, num_mics) block in one call
+    if mixing_time is not None:
+        with Instrumentation.stage('rir'):
+            RIRs = [synthesize(Mics, source_vec[None,:], Room, T60, backend, rng, mixing_time)[0] for T60 in np.atleast_1d(ReverberationTime)]
+        RIRs, dirRIRs = map(list, zip(*[finalize_rir(RIR, Mics, source_vec, sparse_direct, dtype, decay_threshold) for RIR in RIRs]))
+        if np.ndim(ReverberationTime) == 0:
+            RIRs, dirRIRs = RIRs[0], dirRIRs[0]
+    elif np.ndim(ReverberationTime) == 0:
+        with Instrumentation.stage('rir'):
+            RIRs = get_backend(backend).generate(c, rate, Mics, source_vec, Room, ReverberationTime, int(ReverberationTime*rate), order=-1)
+        RIRs, dirRIRs = finalize_rir(RIRs, Mics, source_vec, sparse_direct, dtype, decay_threshold)
+    else:
+        nsamples = [int(T60*rate) for T60 in ReverberationTime]
+        with Instrumentation.stage('rir'):
+            RIRs = get_backend(backend).generate_multi(c, rate, Mics, source_vec, Room, list(ReverberationTime), nsamples, order=-1)
+        RIRs, dirRIRs = map(list, zip(*[finalize_rir(RIR, Mics, source_vec, sparse_direct, dtype, decay_threshold) for RIR in RIRs]))
+    return (np.squeeze(source_vec_off/np.linalg.norm(source_vec_off)),RIRs,dirRIRs)
+
+
+def synthesize(Mics, sources, Room, ReverberationTime, backend=backend, rng=None, mixing_time=hybrid_mixing_time, early_order=hybrid_order):
+    """Function that computes the room impulse responses of several sources at the same microphones. In the hybrid mode only the image sources up to the mixing time (and early_order) are computed exactly, the rest is a diffuse-field coherent noise tail with the expected energy of the image sources of all orders, one envelope for all microphones that decays like the image sources rather than with exactly 60 dB per ReverberationTime, see helper.LateReverb
 
-    offsets = getattr(ArrayStructures,array_type)(dist,num_mics)    # compute source pos in room
-    source_vec_off = generate_source_vec(source_array_dist, Azimuth, Elevation)[None,...]
-    RIRs = []
-    dirRIRs = []
+    :param Mics: (array) microphone positions of shape (M, 3)
+    :param sources: (array) x,y,z source positions of shape (S, 3)
+    :param Room: (array) x, y, z dimension of room
+    :param ReverberationTime: (float) Reverberation time of the room
+    :param backend: (str) name of the backend that computes the image sources, see helper.Backends
+    :param rng: (np.random.Generator) random number generator of the late tail, a fresh one if None
+    :param mixing_time: (float) time in seconds of the transition from image sources to the late tail, all image sources if None
+    :param early_order: (int) maximal reflection order of the exact early part, -1 for all, other orders need a mixing time
+
+    :return: (array) room impulse responses of shape (S, nsample, M)
+    """
+    if mixing_time is None and early_order != -1:
+        raise ValueError('early_order {} needs a mixing time, the late tail replaces the higher orders only after it'.format(early_order))
+    nsample = int(ReverberationTime*rate)
+    if mixing_time is None or int(mixing_time*rate) >= nsample:
+        return get_backend(backend).generate_sources(c, rate, Mics, sources, Room, ReverberationTime, nsample, order=-1)
+    if rng is None:
+        rng = np.random.default_rng()
+    early = get_backend(backend).generate_sources(c, rate, Mics, sources, Room, ReverberationTime, int(mixing_time*rate), order=early_order)
+    return np.stack([extend_late_reverb(imp, Mics, Room, ReverberationTime, nsample, rate, c, rng, early_order) for imp in early])
 
-    # get a random rotation vector
 
-    # compute room positions
-    i = 0
-    while 1:
-        i = i + 1
+def generate_rirs_shared(Azimuths, Elevations, source_array_dist, Room, ReverberationTime, dist, num_mics, array_type, sparse_direct=False, backend=backend, rng=None, dtype=output_dtype, decay_threshold=decay_threshold, mixing_time=hybrid_mixing_time):
+    """Function that generates the room impulse responses of many DOAs with shared array placements: one placement serves all DOAs whose source is in the room, the remaining DOAs get further placements. The sources of one placement are synthesized together against the same microphones. See generate_rir for the parameters
+
+    :param Azimuths: (array) Azimuth angles of the sources to the array center in rad
+    :param Elevations: (array) Elevation angles of the sources to the array center in rad
+
+    :return: Generator of Tuples of the DOA index, the unit-norm vector pointing from array to source, the room impulse responses and the direct path impulse responses (lists with one entry per reverberation time if ReverberationTime is a list), grouped by placement
+    :rtype: Generator
+    """
+    with Instrumentation.stage('geometry'):
+        offsets = array_geometry(array_type, dist, num_mics)
+        source_vec_offs = np.stack([generate_source_vec(source_array_dist, azimuth, elevation) for azimuth, elevation in zip(Azimuths, Elevations)])
+    T60s = list(np.atleast_1d(ReverberationTime))
+    remaining = np.arange(len(Azimuths))
+    while len(remaining):
+        with Instrumentation.stage('placement'):
+            Mics, sources, valid, _ = sample_shared_placement(Room, offsets, source_vec_offs[remaining], rng=rng)
+        doas, sources = remaining[valid], sources[valid]
+        remaining = remaining[~valid]
+        Instrumentation.count('placements')
+        RIRs = []
+        for T60 in T60s:
+            with Instrumentation.stage('rir'):
+                RIRs.append(synthesize(Mics, sources, Room, T60, backend, rng, mixing_time))
+        for cnt, doa in enumerate(doas):
+            vec = source_vec_offs[doa]/np.linalg.norm(source_vec_offs[doa])
+            out = [finalize_rir(RIR[cnt], Mics, sources[cnt], sparse_direct, dtype, decay_threshold) for RIR in RIRs]
+            if np.ndim(ReverberationTime) == 0:
+                yield (doa, vec) + out[0]
+            else:
+                yield (doa, vec, [rir for rir, _ in out], [dirrir for _, dirrir in out])
+
+
+def finalize_rir(RIRs, Mics, source_vec, sparse_direct=False, dtype=output_dtype, decay_threshold=decay_threshold):
+    """Function that truncates room impulse responses at their energy decay threshold, casts them to the output dtype and computes the direct path of the same length
+
+    :param RIRs: (array) room impulse responses of shape (nsample, M)
+    :param Mics: (array) microphone positions of shape (M, 3)
+    :param source_vec: (array) x,y,z source position
+    :param sparse\_direct: (bool) return the direct path as (delay, gain, kernel) dict
+    :param dtype: dtype of the returned impulse responses
+    :param decay_threshold: (float) energy decay in dB at which the impulse responses are truncated, full length if None
+
+    :return: Tuple of the room impulse responses and the direct path impulse responses
+    :rtype: Tuple
+    """
+    with Instrumentation.stage('rir'):
+        if decay_threshold is not None:
+            RIRs = RIRs[:decay_length(RIRs, decay_threshold)]
+        RIRs = RIRs.astype(dtype, copy=False)
+    with Instrumentation.stage('direct'):
+        dirRIRs = direct_path(Mics, source_vec, c, rate, len(RIRs), sparse=sparse_direct)
+        if not sparse_direct:
+            dirRIRs = dirRIRs.astype(dtype, copy=False)
+    return RIRs, dirRIRs
+
+
+def get_doas(array_type, DOA_count):
+    """Function that returns the DOA grid of a configuration: a half circle for ULA, a half sphere for CUA and a sphere for SUA
+
+    :param array_type: (str) one of ULA, CUA, SUA
+    :param DOA_count: (int) number of source positions
+    :return: Tuple of the azimuth and elevation angles in rad
+    :rtype: Tuple
+    """
+    if array_type =='ULA':
+        delta_angle = 180/(DOA_count-1) 
+        Azimuths = (np.arange(0,180+ delta_angle,delta_angle)) / 180 * np.pi
+        Elevations = np.zeros(len(Azimuths))
+    elif array_type=='CUA':
+        Azimuths,Elevations = sampling_grid('shug', DOA_count)
+    elif array_type=='SUA':
+        Azimuths,Elevations = sampling_grid('ssug', DOA_count)
+    else:
+        raise ValueError('array type {} not known'.format(array_type))
+    return Azimuths, Elevations
 
-        print(i)
-        Mic_center = sample_room(Room)
+def parse_doas(doas):
+    """Function that returns the DOA range of a job that computes only a part of the DOAs of its configuration, given as 'start:stop' str, pair or None
 
-        # get random rotation using quaternions
-        rv = proc.random_rotation()
-        # uniform distributed sampling, no gauss :) as cylinder around axi
-        rangle = np.random.rand()*2*np.pi
+    :return: start and stop index of the DOAs, None for all DOAs
+    :rtype: Tuple
+    """
+    if doas in (None, 'None'):
+        return None
+    if isinstance(doas, str):
+        doas = doas.split(':')
+    start, stop = doas
+    return int(start), int(stop)
+
+def get_filename(roomx, roomy, roomz, j, ReverberationTime, dist, path, array_type, num_mics, indx, DOA_count=None, seed=None, doas=None):
+    """Function that returns the name of the file simulate writes for a configuration, see simulate for the parameters
+
+    :return: name of the file
+    :rtype: str
+    """
+    filename = str(path) + "/Room{}{}{}Rev{}Array{}SMD{}ind{}sadist{}.pickle".format(roomx,roomy,roomz,float(ReverberationTime),array_type,float(dist),int(indx),str(float(j)))
+    doas = parse_doas(doas)
+    # a part of a configuration is merged into the file of the configuration, see merge_parts
+    return filename if doas is None else '{}.doas{}-{}'.format(filename, *doas)
 
+def parse_reverberation_times(ReverberationTime):
+    """Function that returns the reverberation times of a job, given as number, list or comma-separated str
 
-        # rotate everything randomly in the room
-        cursource_vec_off = proc.rotate(rangle, rv, source_vec_off)
+    :return: reverberation times
+    :rtype: list of floats
+    """
+    if isinstance(ReverberationTime, str):
+        ReverberationTime = ReverberationTime.split(',')
+    return [float(T60) for T60 in np.atleast_1d(ReverberationTime)]
 
-        curoffsets = offsets.copy()
-        for a in range(offsets.shape[0]):
-            curoffsets[a,:] = proc.rotate(rangle, rv, offsets[a,:])
+def get_filenames(roomx, roomy, roomz, j, ReverberationTime, dist, path, array_type, num_mics, indx, DOA_count=None, seed=None, doas=None):
+    """Function that returns the names of all files simulate writes for a configuration, one per reverberation time
 
-        Mics = Mic_center + curoffsets
-        source_vec = cursource_vec_off + Mic_center
-        #print('Estimate{:.2f}'.format(np.arccos(round(np.sum(cursource_vec_off*(Mic_center-Mics[0])/np.linalg.norm(Mic_center-Mics[0])),4))/np.pi*180))
-        #print('Azimuth{:.2f}'.format(Azimuth/np.pi*180))
-        if not verify_positions(Room, Mics, source_vec):
-            continue
-   
-        #if not verify_DOA(Mics, cursource_vec_off, Azimuth):
-           # print('aaaa')
-            #import ipdb; ipdb.set_trace()
-            #exit()
+    :return: names of the files
+    :rtype: list of str
+    """
+    return [get_filename(roomx, roomy, roomz, j, T60, dist, path, array_type, num_mics, indx, doas=doas) for T60 in parse_reverberation_times(ReverberationTime)]
 
-        print(Mics, source_vec, Room)
-        for cnt in range(num_mics):
-            RIRs.append(pyrir.generate(c, rate, Mics[cnt,...], source_vec, Room, reverberation_time=ReverberationTime,nsample=int(ReverberationTime*rate), order=-1))
-            dirRIRs.append(pyrir.generate(c, rate, Mics[cnt,...], source_vec, Room, reverberation_time=ReverberationTime,nsample=int(ReverberationTime*rate), order=0))
-        break
-    return (np.squeeze(source_vec_off/np.linalg.norm(source_vec_off)),np.concatenate(RIRs,axis=-1),np.concatenate(dirRIRs,axis=-1))
+def merge_parts(filename, DOA_count, force=False):
+    """Function that merges the part files of a configuration that was split at DOA granularity (see helper.Scheduler) into the file of the configuration, once parts for all DOAs are written. Of several concurrently finishing parts only the one that takes the lock merges
 
+    :param filename: (str) name of the file of the configuration
+    :param DOA_count: (int) number of DOAs of the configuration, see get_doas
+    :param force: (bool) remove the lock of a merge that was killed
+    :return: (bool) True if the parts were merged
+    """
+    parts = {}
+    for part in glob.glob(glob.escape(filename) + '.doas*-*'):
+        match = re.search(r'\.doas(\d+)-(\d+)$', part)
+        if match is not None:
+            parts[int(match.group(1))] = (int(match.group(2)), part)
+    ordered = []
+    start = 0
+    while start in parts:
+        start, part = parts[start]
+        ordered.append(part)
+    if start != DOA_count:
+        return False
+    lock = filename + '.merge'
+    if force and os.path.exists(lock):
+        os.remove(lock)
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    try:
+        writer = None
+        with ExitStack() as stack:
+            # one part is loaded at a time
+            for part in ordered:
+                with open(part, 'rb') as f:
+                    data = pickle.load(f)
+                sparse = isinstance(data['DirectRIR'][0], dict)
+                if writer is None:
+                    if 'Codec' in data:
+                        codec = data['Codec']
+                        writer = stack.enter_context(CodecStreamWriter(filename, DOA_count, data['Dist'], sparse, codec['bits'], codec['early'], codec['chunk']))
+                    else:
+                        writer = stack.enter_context(PickleStreamWriter(filename, DOA_count, data['Dist'], sparse))
+                lengths = data.get('Length', [len(rir) for rir in data['RIR']])
+                for vec, rir, dirrir, length in zip(data['Vecs'], data['RIR'], data['DirectRIR'], lengths):
+                    if 'Codec' in data:
+                        writer.append_encoded(vec, rir, dirrir, length)
+                    else:
+                        writer.append(vec, rir[:length], dirrir if sparse else dirrir[:length])
+                del data
+        for part in ordered:
+            os.remove(part)
+    finally:
+        os.remove(lock)
+    return True
 
-def main():
-    """This function gets input parameter from RIR_parameter.py and computes RIRs from them
+def simulate(roomx, roomy, roomz, j, ReverberationTime, dist, path, array_type, num_mics, indx, DOA_count, seed=None, doas=None):
+    """This function computes and writes the RIRs of one configuration from RIR_parameter.py for all DOAs. The parameters can be given as str (from the command line) or as numbers
 
     :param roomx: x position of room
     :type roomx: str
@@ -167,7 +455,7 @@ def main():
     :type roomz: str
     :param j: source array distance
     :type j: str
-    :param ReverberationTime: T60 of the room
+    :param ReverberationTime: T60 of the room, several T60s (list or comma-separated) share the placements and are written to one file each
     :type ReverberationTime: str
     :param dist: inter-microphone distance (ULA) or radius (CUA, ..)
     :type dist: str
@@ -179,50 +467,101 @@ def main():
     :type num_mics: str
     :param indx: How often to go through these parameters based on parameter file ... just used to change the saving name
     :type indx: str
+    :param DOA_count: Number of source positions
+    :type DOA_count: str
+    :param seed: seed of the random number generators for the placements, every DOA gets its own stream SeedSequence(seed, spawn_key=(doa,)), not reproducible if None
+    :type seed: str
+    :param doas: range 'start:stop' of the DOAs computed by this job, the part is written to its own file and merged into the file of the configuration by the last part, all DOAs if None
+    :type doas: str
+
+    :return: name of the written file (list of names for several T60s, the part files if the configuration is not complete yet) or, if the storage is 'shards', the directory of the store
+    :rtype: str
     """
-    print(sys.argv)
-    _, roomx,roomy,roomz, j, ReverberationTime , dist, path, array_type, num_mics,indx, DOA_count= sys.argv
     indx = int(indx)
     num_mics = int(num_mics)
     DOA_count = int(DOA_count)
-    data_path = str(path)
     dist = float(dist)
     Room = np.array([float(roomx),float(roomy),float(roomz)])
     j =  float(j)
-    ReverberationTime = float(ReverberationTime)
+    multi = isinstance(ReverberationTime, (list, tuple)) or ',' in str(ReverberationTime)
+    ReverberationTimes = parse_reverberation_times(ReverberationTime)
     source_array_dist = float(j)
-    RIRs = []
-    dirRIRs = []
-    Vecs = []
-    if array_type =='ULA':
-        delta_angle = 180/(DOA_count-1) 
-        Azimuths = (np.arange(0,180+ delta_angle,delta_angle)) / 180 * np.pi
-        Elevations = [0]
-        for caz, azimuth in enumerate(Azimuths):
-            vec, rir,dirrir = generate_rir(azimuth,0, source_array_dist, Room, ReverberationTime, dist, num_mics, array_type)
-            RIRs.append(rir)
-            dirRIRs.append(dirrir)
-            Vecs.append(vec)
-    elif array_type=='CUA':
-        Azimuths,Elevations = shug(DOA_count)
-        for caz, azimuth in enumerate(Azimuths):
-            vec, rir, dirrir = generate_rir(azimuth, Elevations[caz], source_array_dist, Room, ReverberationTime, dist, num_mics, array_type)
-            RIRs.append(rir)
-            dirRIRs.append(dirrir)
-            Vecs.append(vec)
-    elif array_type=='SUA':
-        Azimuths,Elevations = ssug(DOA_count)
-        for caz, azimuth in enumerate(Azimuths):
-            vec, rir,dirrir = generate_rir(azimuth, Elevations[caz], source_array_dist, Room, ReverberationTime, dist, num_mics, array_type)
-            RIRs.append(rir)
-            dirRIRs.append(dirrir)
-            Vecs.append(vec)
-        
-    else:
-        print('array type not known')
-        exit()
-    filename = data_path + "/Room{}{}{}Rev{}Array{}SMD{}ind{}sadist{}.pickle".format(roomx,roomy,roomz,ReverberationTime,array_type,dist,indx,str(j))
-    Dict = {'RIR': np.asarray(RIRs), 'Dist': dist,'Vecs': Vecs,'DirectRIR':np.asarray(dirRIRs)}
-    write(Dict, filename)
+    seed = None if seed in (None, 'None') else int(seed)
+    doas = parse_doas(doas)
+    start = 0 if doas is None else doas[0]
+    # entropy of all streams of the job, drawn once if there is no seed
+    entropy = np.random.SeedSequence(seed).entropy
+    Azimuths, Elevations = get_doas(array_type, DOA_count)
+    doa_total = len(Azimuths)
+    if doas is not None:
+        Azimuths, Elevations = Azimuths[doas[0]:doas[1]], Elevations[doas[0]:doas[1]]
+    meta = {'room': [float(x) for x in Room], 'T60': ReverberationTimes, 'array_type': array_type, 'dmic': dist, 'distance': j,
+            'num_mics': num_mics, 'rep': indx, 'doa_count': len(Azimuths), 'seed': seed, 'doas': doas}
+    with Instrumentation.job(stats_file, **meta) as stats:
+        # every DOA is written as soon as it is generated, so only one DOA is held in memory
+        if storage == 'shards':
+            densify = (lambda direct: densify_direct_path(direct, rate)) if sparse_direct else None
+            store = ShardStreamWriter(os.path.join(str(path), 'shards'), densify=densify, shard_size=shard_size, dtype=output_dtype,
+                                      room=Room, array_type=array_type, dmic=dist, distance=j, rep=indx, seed=seed)
+            writers = [store]
+            appends = [partial(store.append, T60=T60) for T60 in ReverberationTimes]
+            filenames = [store.path]
+        else:
+            filenames = [get_filename(roomx, roomy, roomz, j, T60, dist, path, array_type, num_mics, indx, doas=doas) for T60 in ReverberationTimes]
+            if storage == 'codec':
+                writers = [CodecStreamWriter(filename, len(Azimuths), dist, sparse_direct, codec_bits, int(codec_early*rate), codec_chunk) for filename in filenames]
+            else:
+                writers = [PickleStreamWriter(filename, len(Azimuths), dist, sparse_direct) for filename in filenames]
+            appends = [writer.append for writer in writers]
+        with ExitStack() as stack:
+            for writer in writers:
+                stack.enter_context(writer)
+            if write_queue_size:
+                # entered last, so it is drained (or stopped on an error) before the writers are closed
+                background = stack.enter_context(BackgroundWriter(write_queue_size))
+                appends = [partial(background.submit, append) for append in appends]
+            ReverberationTime = ReverberationTimes if multi else ReverberationTimes[0]
+            if shared_placement:
+                # the placements are shared by the DOAs of a job, so only the same split is reproducible, see RIR_parameter.schedule
+                rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(start,)))
+                results = generate_rirs_shared(Azimuths, Elevations, source_array_dist, Room, ReverberationTime, dist, num_mics, array_type, sparse_direct, rng=rng)
+            else:
+                # every DOA draws from its own stream, so a split configuration is bitwise equal to the whole
+                results = ((caz,) + generate_rir(azimuth, Elevations[caz], source_array_dist, Room, ReverberationTime, dist, num_mics, array_type, sparse_direct,
+                                                 rng=np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(start + caz,))))
+                           for caz, azimuth in enumerate(Azimuths))
+            # shared placements return the DOAs grouped by placement, they are written in DOA order as soon as possible
+            buffered = {}
+            next_doa = 0
+            for caz, *result in results:
+                buffered[caz] = result
+                while next_doa in buffered:
+                    vec, RIRs, dirRIRs = buffered.pop(next_doa)
+                    next_doa += 1
+                    if not multi:
+                        RIRs, dirRIRs = [RIRs], [dirRIRs]
+                    with Instrumentation.stage('serialization'):
+                        for append, RIR, dirRIR in zip(appends, RIRs, dirRIRs):
+                            append(vec, RIR, dirRIR)
+                    stats.count('doas')
+            with Instrumentation.stage('serialization'):
+                stack.close()
+        if write_queue_size:
+            # the stage 'serialization' only holds the time the synthesis waited for the writer
+            stats.count('writer_busy_s', background.busy)
+        stats.count('bytes_written', sum(writer.bytes_written for writer in writers))
+        if doas is not None and storage != 'shards':
+            finals = [get_filename(roomx, roomy, roomz, j, T60, dist, path, array_type, num_mics, indx) for T60 in ReverberationTimes]
+            with Instrumentation.stage('serialization'):
+                if all([merge_parts(filename, doa_total) for filename in finals]):
+                    filenames = finals
+        stats.meta['files'] = filenames
+    return filenames if multi and storage != 'shards' else filenames[0]
+
+def main():
+    """This function gets input parameter from RIR_parameter.py (via the command line) and computes RIRs from them, see simulate
+    """
+    simulate(*sys.argv[1:])
+
 if __name__ == '__main__':
     main()
@@ -26,4 +26,60 @@ rate = 16000
 # minimal distance of source and microphones to walls
 wdist = 1.
 # Number of source positions for each configuration (divides the direciton-of-arrival (DOA) space)
-doa_count  = 37
\ No newline at end of file
+doa_count  = 37
+# store the direct path as (delay, gain, kernel) per microphone instead of a dense, mostly-zero impulse response (expand with helper.DirectPath.densify_direct_path)
+sparse_direct = False
+# number of candidate array/source placements that are validated at once
+placement_batch = 1024
+# number of candidate placements after which the sampling gives up with an error
+max_placement_attempts = 100000
+# backend that computes the room impulse responses: 'rir_generator' (C extension) or 'numpy' (vectorized image source method in helper/ImageSource.py)
+backend = 'rir_generator'
+# number of worker processes of RIR_pool.py, 0 uses all cores
+num_workers = 0
+# root seed of the parameter grid, every configuration gets its own seed derived from it
+seed = 0
+# output format: 'pickle' (one file per configuration), 'codec' (one file per configuration with compressed impulse responses, load with helper.RIRCodec.load) or 'shards' (memory-mappable shards with a metadata index in <data_path>/shards, see helper/ShardStore.py)
+storage = 'pickle'
+# size in bytes after which a new shard file is started
+shard_size = 2**30
+# directory in which microphone geometries and DOA grids are cached for all workers of a sweep, None keeps the cache in memory only
+geometry_cache_dir = None
+# compute all reverberation times of a room, distance and repetition in one job that shares the placements and the image source geometry (one file per reverberation time as before). Only the 'numpy' backend shares the image source geometry, the others warn and simulate every reverberation time separately
+share_placement_across_t60 = False
+# dtype of the stored impulse responses, 'float32' halves storage and memory bandwidth
+output_dtype = 'float64'
+# truncate every impulse response where its Schroeder energy decay curve fell by this many dB on all microphones (e.g. 60), None keeps nsample = T60*rate; the actual length is stored with the output
+decay_threshold = None
+# JSON lines file that every job appends its stage timings and counters to (see helper/Instrumentation.py and RIR_stats.py), None records nothing
+stats_file = None
+# queue directory of RIR_queue.py on a filesystem shared by all nodes, None uses <data_path>/queue
+queue_dir = None
+# seconds between two heartbeats of a worker on its claimed job
+heartbeat_interval = 30
+# seconds without heartbeat after which the job of a dead worker is re-queued
+stale_timeout = 300
+# use one array placement for as many DOAs as fit in the room and synthesize their sources together, False samples an independent placement per DOA. The placement serving the most DOAs is chosen, which biases the array positions towards the room center
+shared_placement = False
+# hybrid synthesis for long reverberation times: image sources only up to this time in seconds (e.g. 0.08), followed by a decaying noise tail with diffuse-field coherence between the microphones and the expected energy of the image sources, shared by all microphones and decaying like the image sources (somewhat faster than the Sabine T60), None computes all image sources
+hybrid_mixing_time = None
+# maximal reflection order of the image sources before the mixing time, -1 for all, other orders need hybrid_mixing_time. The expected energy of the higher orders before the mixing time is added as noise
+hybrid_order = -1
+# local directory of a cache of generated impulse responses keyed by all inputs including the seed, None disables the cache
+rir_cache_dir = None
+# size budget of the cache in bytes, the least recently used entries are evicted beyond it
+rir_cache_size = 50*2**30
+# bit depth of the quantization of the 'codec' storage, the error of every sample is at most half a quantization step of its chunk (2 to 32)
+codec_bits = 16
+# length in seconds of the early part that the 'codec' storage keeps as (delay, amplitude) pairs
+codec_early = 0.05
+# number of samples per compressed chunk of the tail
+codec_chunk = 4096
+# Unix domain socket of the generation server of RIR_server.py, None uses RIR_server.sock in the temporary directory
+server_socket = None
+# number of worker processes of the generation server, 0 uses all cores
+server_workers = 0
+# maximal cost of a part of a job split by the scheduler of RIR_pool.py/RIR_parameter.py --schedule, as fraction 1/(schedule_parts_per_worker*workers) of the estimated cost of the sweep
+schedule_parts_per_worker = 4
+# number of finished DOA blocks that wait for the background thread that serializes and writes them while the next DOAs are synthesized, 0 writes in the simulating thread
+write_queue_size = 4
\ No newline at end of file
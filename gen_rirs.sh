@@ -3,3 +3,17 @@
 
 # RIR files
 python ./RIR_parameter.py | parallel --colsep ' ' python ./RIR_write_quaternion.py
+
+# longest jobs first, stragglers split at DOA granularity, and the projected wall time and output size of the grid
+# python ./RIR_parameter.py --schedule --workers 8 | parallel -j 8 --colsep ' ' python ./RIR_write_quaternion.py
+# python ./RIR_parameter.py --dry-run --workers 8
+
+# alternatively, without GNU parallel, on a pool of persistent python workers
+# python ./RIR_pool.py --workers 8
+
+# with stats_file set in config/config.py, throughput and ETA of the running sweep
+# python ./RIR_stats.py
+
+# on several nodes sharing a filesystem: fill the queue once, then start workers on every node
+# python ./RIR_queue.py init
+# python ./RIR_queue.py work --workers 8
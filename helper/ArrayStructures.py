@@ -1,6 +1,5 @@
 import numpy as np
-from helper.UniformSphericalSampling import sample_sphere_uniformly_geometric as ssug
-from helper.Quaternions import QuatProc
+from helper.UniformSphericalSampling import sample_sphere_uniformly_geometric as ssug, angles_to_vectors
 from helper.platonic_solids import PLATONIC_SOLIDS, is_platonic_number
 #import matplotlib.pyplot as plt
 #from mpl_toolkits.mplot3d import Axes3D
@@ -34,28 +33,27 @@ def CUA(rad, num_mics):
     mics_pos = np.array([np.real(mics_pos),np.imag(mics_pos),[0]*num_mics])
     return mics_pos.T
 
-def SUA(rad,num_mics):
+def SUA(rad,num_mics,directions=None):
     """
     Function that samples a Sphere uniformly with num_mics microphones
     :param rad: radius of the sphere
     :param num_mics: number of microphones on the sphere
+    :param directions: (array) unit vectors of shape (num_mics, 3) of the microphones, e.g. from the batch samplers of helper.UniformSphericalSampling, None for a platonic solid or the geometric sampling
     :return: positions of the microphones on the sphere
     """
+    if directions is not None:
+        directions = np.asarray(directions, dtype=float)
+        if directions.shape != (num_mics, 3):
+            raise ValueError('directions of shape {} instead of ({}, 3)'.format(directions.shape, num_mics))
+        if not np.allclose(np.linalg.norm(directions, axis=1), 1):
+            raise ValueError('directions are not unit vectors')
+        return rad*directions
     if is_platonic_number(num_mics):
             return PLATONIC_SOLIDS[num_mics].calc_coordinates(rad)
     azimuth, elevation = ssug(num_mics)
-    proc = QuatProc()
-    rotaxy = np.array([0,1,0])
-    rotaxz = np.array([0,0,1])
-    start_point = np.array([1,0,0])
-    mics = []
-    for idx, az in enumerate(azimuth):
-        #turn vector over y axis for the proper elevation
-        mic = proc.rotate(elevation[idx], rotaxy, start_point)
-        # get azimuth around z axis
-        mic = proc.rotate(azimuth[idx],rotaxz,mic)
-        mics.append(mic)
-    return rad*np.array(mics)
+    # [1,0,0] turned over the y axis for the elevation (towards -z), then around the z axis for the azimuth
+    mics = angles_to_vectors(azimuth, -elevation)
+    return rad*mics
 
 '''
 points = SUA(2,200)
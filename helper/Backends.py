@@ -0,0 +1,114 @@
+import warnings
+import numpy as np
+from functools import lru_cache
+from helper import ImageSource
+
+class RIRBackend:
+    '''
+    Interface of the room impulse response backends that generate_rir dispatches through. A backend computes the responses of one source at all microphones of an array
+    '''
+    name = None
+
+    def version(self):
+        """
+        :return: (str) version of the implementation, results of different versions may differ
+        """
+        raise NotImplementedError
+
+    def generate(self, c, rate, mics, source, room, reverberation_time, nsample, order=-1):
+        """
+        :param c: (float) speed of sound
+        :param rate: (int) sampling frequency
+        :param mics: (array) microphone positions of shape (M, 3)
+        :param source: (array) x,y,z source position
+        :param room: (array) x,y,z room dimensions
+        :param reverberation_time: (float) T60 of the room in seconds
+        :param nsample: (int) length of the impulse responses
+        :param order: (int) maximal reflection order, -1 for all
+        :return: (array) room impulse responses of shape (nsample, M)
+        """
+        raise NotImplementedError
+
+    def generate_multi(self, c, rate, mics, source, room, reverberation_times, nsamples, order=-1):
+        """
+        Function that computes the responses of one placement for several reverberation times. Backends that can share the image source geometry across reverberation times override it, this fallback warns that it runs one full simulation per T60
+
+        :param reverberation_times: (list of floats) T60s of the room in seconds
+        :param nsamples: (list of ints) length of the impulse responses per T60
+        :return: list of room impulse responses of shape (nsample, M), one per T60
+        """
+        if len(reverberation_times) > 1:
+            warnings.warn("backend {} cannot share the image source geometry across reverberation times, every T60 is simulated separately, use the 'numpy' backend to share it".format(self.name), RuntimeWarning)
+        return [self.generate(c, rate, mics, source, room, T60, nsample, order) for T60, nsample in zip(reverberation_times, nsamples)]
+
+    def generate_sources(self, c, rate, mics, sources, room, reverberation_time, nsample, order=-1):
+        """
+        Function that computes the responses of several sources at the same microphones. Backends that can share the receiver-side work across sources override it
+
+        :param sources: (array) x,y,z source positions of shape (S, 3)
+        :return: (array) room impulse responses of shape (S, nsample, M)
+        """
+        return np.stack([self.generate(c, rate, mics, source, room, reverberation_time, nsample, order) for source in np.atleast_2d(sources)])
+
+class RIRGeneratorBackend(RIRBackend):
+    '''
+    Image source method of the rir_generator C extension
+    '''
+    name = 'rir_generator'
+
+    def version(self):
+        from importlib.metadata import version
+        return version('rir-generator')
+
+    def generate(self, c, rate, mics, source, room, reverberation_time, nsample, order=-1):
+        import rir_generator as pyrir
+        return pyrir.generate(c, rate, mics, source, room, reverberation_time=reverberation_time, nsample=nsample, order=order)
+
+class NumpyBackend(RIRBackend):
+    '''
+    Vectorized image source method in helper.ImageSource
+    '''
+    name = 'numpy'
+
+    def version(self):
+        # the image source code is part of this repository, its results only depend on numpy
+        return np.__version__
+
+    def generate(self, c, rate, mics, source, room, reverberation_time, nsample, order=-1):
+        return ImageSource.generate(c, rate, mics, source, room, reverberation_time, nsample, order)
+
+    def generate_multi(self, c, rate, mics, source, room, reverberation_times, nsamples, order=-1):
+        return ImageSource.generate_multi(c, rate, mics, source, room, reverberation_times, nsamples, order)
+
+    def generate_sources(self, c, rate, mics, sources, room, reverberation_time, nsample, order=-1):
+        return ImageSource.generate_sources(c, rate, mics, sources, room, reverberation_time, nsample, order)
+
+
+BACKENDS = {
+    RIRGeneratorBackend.name: RIRGeneratorBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+@lru_cache(maxsize=None)
+def backend_versions():
+    """
+    :return: version of every available backend, None for backends that cannot be imported
+    :rtype: dict
+    """
+    versions = {}
+    for name, backend in BACKENDS.items():
+        try:
+            versions[name] = backend().version()
+        except Exception:
+            versions[name] = None
+    return versions
+
+def get_backend(name):
+    """
+    :param name: (str) one of the keys of BACKENDS
+    :return: backend instance
+    :rtype: RIRBackend
+    """
+    if name not in BACKENDS:
+        raise ValueError('backend {} not known, use one of {}'.format(name, list(BACKENDS.keys())))
+    return BACKENDS[name]()
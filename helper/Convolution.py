@@ -0,0 +1,183 @@
+from collections import OrderedDict
+import numpy as np
+from scipy import fft
+
+class RIRConvolver:
+    '''
+    Convolves dry signals with one block of impulse responses (nsample, M) by overlap-add FFT convolution. The spectra of the impulse responses are computed once and reused for every signal. Long signals are processed in blocks, so the memory is bounded by the block size and not by the signal length
+    '''
+    def __init__(self, rir, block_size=None, workers=-1):
+        """
+        :param rir: (array) impulse responses of shape (nsample, M) or (nsample,)
+        :param block_size: (int) number of input samples per FFT block, max(nsample, 4096) if None
+        :param workers: (int) number of threads of the FFTs, -1 uses all cores
+        """
+        rir = np.asarray(rir)
+        self.squeeze = rir.ndim == 1
+        self.rir = rir.reshape(len(rir), -1)
+        self.length = len(rir)
+        self.block_size = block_size or max(self.length, 4096)
+        self.nfft = fft.next_fast_len(self.block_size + self.length - 1, real=True)
+        self.workers = workers
+        # spectra of shape (nfft//2 + 1, M)
+        self.spectra = fft.rfft(self.rir, self.nfft, axis=0, workers=workers)
+
+    def _block(self, x):
+        # (B, n) -> (B, n + length - 1, M)
+        X = fft.rfft(x, self.nfft, axis=-1, workers=self.workers)
+        y = fft.irfft(X[:,:,None]*self.spectra[None,:,:], self.nfft, axis=1, workers=self.workers)
+        return y[:,:x.shape[1] + self.length - 1]
+
+    def process(self, block, pending=None):
+        """
+        Function that convolves the next block of a streamed signal (or batch of signals) and adds the overlap of the previous blocks
+
+        :param block: (array) next input samples of shape (n,) or (B, n), n may be 0
+        :param pending: (array) overlap returned for the previous block, None for the first block
+        :return: Tuple of the output block of shape (n, M) or (B, n, M) and the overlap for the next block
+        :rtype: Tuple
+        """
+        block = np.asarray(block)
+        batch = block if block.ndim == 2 else block[None]
+        out = []
+        for start in range(0, batch.shape[1], self.block_size):
+            y = self._block(batch[:,start:start + self.block_size])
+            if pending is None:
+                pending = np.zeros((len(batch), self.length - 1, self.rir.shape[1]), dtype=y.dtype)
+            y[:,:self.length - 1] += pending
+            n = y.shape[1] - self.length + 1
+            out.append(y[:,:n])
+            pending = y[:,n:]
+        if pending is None:
+            # the first block is empty, the tail stays silent
+            pending = np.zeros((len(batch), self.length - 1, self.rir.shape[1]))
+        out = np.concatenate(out, axis=1) if out else np.zeros((len(batch), 0, self.rir.shape[1]))
+        return self._shape(out, block.ndim == 2), pending
+
+    def finish(self, pending, batch=False):
+        """
+        :param pending: (array) overlap returned for the last block
+        :param batch: (bool) the blocks were batches of shape (B, n)
+        :return: (array) the last nsample - 1 output samples
+        """
+        return self._shape(pending, batch)
+
+    def stream(self, blocks):
+        """
+        Function that convolves a signal (or a batch of signals) given as consecutive blocks of any length. Only one FFT block and the overlap of length nsample - 1 are held in memory
+
+        :param blocks: iterable of arrays of shape (n,) or (B, n)
+        :return: Generator of the output blocks of shape (n, M) or (B, n, M), one per input block, followed by the tail of length nsample - 1
+        :rtype: Generator
+        """
+        pending = None
+        batch = False
+        for block in blocks:
+            batch = np.ndim(block) == 2
+            out, pending = self.process(block, pending)
+            yield out
+        if pending is not None:
+            yield self.finish(pending, batch)
+
+    def _shape(self, y, batch):
+        if self.squeeze:
+            y = y[...,0]
+        return y if batch else y[0]
+
+    def convolve(self, signals, mode='full'):
+        """
+        :param signals: (array) dry signals of shape (T,) or (B, T), for T = 0 the output of mode 'full' is nsample - 1 zeros
+        :param mode: (str) 'full' for T + nsample - 1 output samples, 'same' for the first T
+        :return: (array) convolved signals of shape (T', M) or (B, T', M), without M for one-dimensional impulse responses
+        """
+        signals = np.asarray(signals)
+        out, pending = self.process(signals)
+        if mode == 'same':
+            return out
+        axis = signals.ndim - 1
+        return np.concatenate([out, self.finish(pending, signals.ndim == 2)], axis=axis)
+
+def convolve(signals, rir, mode='full', block_size=None, workers=-1):
+    """
+    Function that convolves dry signals with impulse responses of shape (nsample, M), see RIRConvolver
+
+    :param signals: (array) dry signals of shape (T,) or (B, T)
+    :param rir: (array) impulse responses of shape (nsample, M) or (nsample,)
+    :param mode: (str) 'full' or 'same'
+    :return: (array) convolved signals of shape (T', M) or (B, T', M)
+    """
+    return RIRConvolver(rir, block_size, workers).convolve(signals, mode)
+
+class ConvolutionStage:
+    '''
+    Pipeline stage that convolves dry signals with the entries of RIRDatasets of the same data, e.g. the reverberant 'RIR' and the 'DirectRIR' target of every entry. The convolvers (spectra) of the latest entries are cached, so all signals convolved with the same entry share them
+    '''
+    def __init__(self, datasets, block_size=None, cache_size=64, workers=-1):
+        """
+        :param datasets: (dict) helper.DatasetReader.RIRDataset per target name, all over the same entries, e.g. {'RIR': RIRDataset(path), 'DirectRIR': RIRDataset(path, 'DirectRIR')}
+        :param block_size: (int) number of input samples per FFT block, see RIRConvolver
+        :param cache_size: (int) number of cached convolvers per target
+        :param workers: (int) number of threads of the FFTs, -1 uses all cores
+        """
+        lengths = set(len(dataset) for dataset in datasets.values())
+        if len(lengths) != 1:
+            raise ValueError('datasets have different numbers of entries {}'.format(sorted(lengths)))
+        vecs = [dataset.index['vec'] for dataset in datasets.values()]
+        if not all(np.array_equal(vec, vecs[0]) for vec in vecs[1:]):
+            raise ValueError('datasets do not have the same entries')
+        self.datasets = datasets
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.workers = workers
+        self.cache = OrderedDict()
+
+    def __len__(self):
+        return len(next(iter(self.datasets.values())))
+
+    def convolver(self, target, i):
+        """
+        :param target: (str) name of the dataset
+        :param i: (int) position in the index of the dataset
+        :return: (RIRConvolver) cached convolver of the entry
+        """
+        key = (target, int(i))
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        rir, _ = self.datasets[target][i]
+        self.cache[key] = RIRConvolver(rir, self.block_size, self.workers)
+        if len(self.cache) > self.cache_size*len(self.datasets):
+            self.cache.popitem(last=False)
+        return self.cache[key]
+
+    def __call__(self, i, signals, mode='full'):
+        """
+        :param i: (int) position in the index of the datasets
+        :param signals: (array) dry signals of shape (T,) or (B, T)
+        :param mode: (str) 'full' or 'same'
+        :return: Tuple of a dict with the convolved signals of shape (T', M) or (B, T', M) per target and the unit-norm vector pointing from array to source
+        :rtype: Tuple
+        """
+        out = {target: self.convolver(target, i).convolve(signals, mode) for target in self.datasets}
+        return out, next(iter(self.datasets.values())).index[i]['vec']
+
+    def stream(self, i, blocks):
+        """
+        Function that convolves a long signal given as consecutive blocks with an entry of all datasets, see RIRConvolver.stream
+
+        :param i: (int) position in the index of the datasets
+        :param blocks: iterable of arrays of shape (n,) or (B, n)
+        :return: Generator of dicts with the output blocks per target, the last one with the tails
+        :rtype: Generator
+        """
+        convolvers = {target: self.convolver(target, i) for target in self.datasets}
+        pending = dict.fromkeys(convolvers)
+        batch = False
+        for block in blocks:
+            batch = np.ndim(block) == 2
+            out = {}
+            for target, convolver in convolvers.items():
+                out[target], pending[target] = convolver.process(block, pending[target])
+            yield out
+        if all(value is not None for value in pending.values()):
+            yield {target: convolver.finish(pending[target], batch) for target, convolver in convolvers.items()}
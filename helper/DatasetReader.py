@@ -0,0 +1,266 @@
+import os
+import re
+import glob
+import pickle
+import struct
+import numpy as np
+from helper.ShardStore import ShardReader
+from helper import RIRCodec
+
+# one entry per (file, DOA, mic slice), the offset and shape describe the array of the whole file, or the encoded block of the DOA if 'encoded' (its size) is not 0
+ENTRY_DTYPE = np.dtype([
+    ('file', '<i4'),
+    ('offset', '<i8'),
+    ('shape', '<i8', (3,)),
+    ('dtype', 'S8'),
+    ('fortran', '?'),
+    ('doa', '<i4'),
+    ('length', '<i8'),
+    ('mic_start', '<i4'),
+    ('mic_stop', '<i4'),
+    ('room', 'S32'),
+    ('T60', '<f8'),
+    ('array_type', 'S8'),
+    ('dmic', '<f8'),
+    ('distance', '<f8'),
+    ('vec', '<f8', (3,)),
+    ('encoded', '<i8'),
+])
+
+FILENAME_PATTERN = re.compile(r'Room(?P<room>.+)Rev(?P<T60>[0-9.]+)Array(?P<array_type>[A-Za-z]+)SMD(?P<dmic>[0-9.]+)ind(?P<indx>[0-9]+)sadist(?P<distance>[0-9.]+)\.pickle$')
+
+class _Payload:
+    '''
+    Position of a large bytes object in a pickle file that was skipped instead of read
+    '''
+    def __init__(self, offset, size):
+        self.offset = offset
+        self.size = size
+
+class _LazyArray:
+    '''
+    Array description (offset, dtype, shape, order) that replaces numpy arrays while a pickle is scanned
+    '''
+    def __init__(self, *args):
+        self.data = None
+
+    def __setstate__(self, state):
+        # state of ndarray.__reduce__: (version, shape, dtype, is_fortran, rawdata)
+        _, self.shape, self.dtype, self.fortran, self.data = state
+
+    @classmethod
+    def frombuffer(cls, buf, dtype, shape, order):
+        arr = cls()
+        arr.data, arr.dtype, arr.shape, arr.fortran = buf, dtype, shape, order == 'F'
+        return arr
+
+    def materialize(self):
+        if isinstance(self.data, _Payload):
+            return self
+        return np.ndarray(self.shape, self.dtype, bytes(self.data), order='F' if self.fortran else 'C').copy()
+
+class _ScanUnpickler(pickle._Unpickler):
+    '''
+    Unpickler that skips the raw data of large arrays and returns their position in the file instead, so a pickle written by RIR_write_quaternion can be indexed without loading it
+    '''
+    dispatch = dict(pickle._Unpickler.dispatch)
+
+    def __init__(self, file, min_size=1 << 10):
+        super().__init__(file)
+        self.scan_file = file
+        self.min_size = min_size
+
+    def _payload(self, size, convert):
+        frame = self._unframer.current_frame
+        if size >= self.min_size and (frame is None or frame.tell() == len(frame.getbuffer())):
+            # large payloads are written outside of frames, their file position is known
+            self._unframer.current_frame = None
+            offset = self.scan_file.tell()
+            self.scan_file.seek(size, os.SEEK_CUR)
+            self.append(_Payload(offset, size))
+        else:
+            self.append(convert(self.read(size)))
+
+    def load_binbytes(self):
+        size, = struct.unpack('<I', self.read(4))
+        self._payload(size, bytes)
+    dispatch[pickle.BINBYTES[0]] = load_binbytes
+
+    def load_binbytes8(self):
+        size, = struct.unpack('<Q', self.read(8))
+        self._payload(size, bytes)
+    dispatch[pickle.BINBYTES8[0]] = load_binbytes8
+
+    def load_bytearray8(self):
+        size, = struct.unpack('<Q', self.read(8))
+        self._payload(size, bytearray)
+    dispatch[pickle.BYTEARRAY8[0]] = load_bytearray8
+
+    def find_class(self, module, name):
+        if module.endswith('core.multiarray') and name == '_reconstruct':
+            return _LazyArray
+        if module.endswith('core.numeric') and name == '_frombuffer':
+            return _LazyArray.frombuffer
+        return super().find_class(module, name)
+
+def scan_pickle(filename):
+    """
+    Function that reads the content of a pickle written by RIR_write_quaternion without the data of its large arrays
+
+    :param filename: (str) pickle file
+    :return: dict with 'RIR', 'Dist', 'Vecs', 'DirectRIR' (and 'Length') where large arrays are replaced by descriptions with offset, shape, dtype and order
+    :rtype: dict
+    """
+    with open(filename, 'rb') as f:
+        data = _ScanUnpickler(f).load()
+    data['Vecs'] = [vec.materialize() if isinstance(vec, _LazyArray) else vec for vec in data['Vecs']]
+    return data
+
+class RIRDataset:
+    '''
+    Lazy random-access reader over the outputs of RIR_write_quaternion (pickle files, also with encoded impulse responses, or a shard store). A one-time index of all (file, DOA, mic slice) entries is built without loading the impulse responses, which are served as views into memory-mapped files. The index can be filtered by room, T60 and array type. Instances can be passed to worker processes: memory maps are opened lazily in every process
+    '''
+    def __init__(self, path, target='RIR', mics_per_sample=None):
+        """
+        :param path: (str) data path with pickle files and/or a 'shards' store
+        :param target: (str) 'RIR' or 'DirectRIR'
+        :param mics_per_sample: (int) number of microphones of every sample, all microphones of a DOA if None
+        """
+        self.path = path
+        self.target = target
+        self.files = []
+        entries = []
+        for filename in sorted(glob.glob(os.path.join(path, '*.pickle'))):
+            entries += self._index_pickle(filename, mics_per_sample)
+        if os.path.isdir(os.path.join(path, 'shards')):
+            entries += self._index_shards(os.path.join(path, 'shards'), mics_per_sample)
+        self.index = np.array(entries, dtype=ENTRY_DTYPE)
+        self._maps = {}
+        self._pid = os.getpid()
+
+    def _add_file(self, filename):
+        self.files.append(filename)
+        return len(self.files) - 1
+
+    def _slices(self, num_mics, mics_per_sample):
+        step = num_mics if mics_per_sample is None else mics_per_sample
+        return [(start, start + step) for start in range(0, num_mics - step + 1, step)]
+
+    def _index_pickle(self, filename, mics_per_sample):
+        match = FILENAME_PATTERN.search(os.path.basename(filename))
+        if match is None:
+            return []
+        data = scan_pickle(filename)
+        if 'Codec' in data:
+            return self._index_encoded(filename, data, match.groupdict(), mics_per_sample)
+        arr = data[self.target]
+        if not isinstance(arr, _LazyArray) or not isinstance(arr.data, _Payload):
+            # sparse direct paths or tiny arrays are not memory-mappable
+            return []
+        fid = self._add_file(filename)
+        meta = match.groupdict()
+        # pickles without 'Length' store all DOAs at full length
+        lengths = data.get('Length', [arr.shape[1]]*arr.shape[0])
+        entries = []
+        for doa in range(arr.shape[0]):
+            for start, stop in self._slices(arr.shape[2], mics_per_sample):
+                entries.append((fid, arr.data.offset, arr.shape, np.dtype(arr.dtype).str, arr.fortran, doa, lengths[doa], start, stop,
+                                meta['room'], float(meta['T60']), meta['array_type'], float(meta['dmic']), float(meta['distance']), data['Vecs'][doa], 0))
+        return entries
+
+    def _index_encoded(self, filename, data, meta, mics_per_sample):
+        blocks = data[self.target]
+        if not all(isinstance(block, _Payload) for block in blocks):
+            # sparse direct paths are not encoded
+            return []
+        fid = self._add_file(filename)
+        entries = []
+        with open(filename, 'rb') as f:
+            for doa, block in enumerate(blocks):
+                f.seek(block.offset)
+                head = f.read(8)
+                header, _ = RIRCodec.read_header(head + f.read(struct.unpack('<I', head[4:])[0]))
+                length, num_mics = header['shape']
+                for start, stop in self._slices(num_mics, mics_per_sample):
+                    entries.append((fid, block.offset, (1, length, num_mics), header['dtype'], False, 0, length, start, stop,
+                                    meta['room'], float(meta['T60']), meta['array_type'], float(meta['dmic']), float(meta['distance']), data['Vecs'][doa], block.size))
+        return entries
+
+    def _index_shards(self, path, mics_per_sample):
+        store = ShardReader(path)
+        entries = []
+        fids = {}
+        for record in store.index[store.select(target=self.target)]:
+            shard = os.path.join(path, record['shard'].decode())
+            if shard not in fids:
+                fids[shard] = self._add_file(shard)
+            room = '{:g}{:g}{:g}'.format(*record['room'])
+            for start, stop in self._slices(int(record['num_mics']), mics_per_sample):
+                entries.append((fids[shard], record['offset'], (1, record['length'], record['num_mics']), record['dtype'], False, 0, record['length'], start, stop,
+                                room, record['T60'], record['array_type'], record['dmic'], record['distance'], record['doa'], 0))
+        return entries
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_maps'] = {}
+        return state
+
+    def _map(self, fid):
+        if self._pid != os.getpid():
+            # memory maps are not shared with forked worker processes
+            self._maps = {}
+            self._pid = os.getpid()
+        if fid not in self._maps:
+            self._maps[fid] = np.memmap(self.files[fid], dtype=np.uint8, mode='r')
+        return self._maps[fid]
+
+    def __getitem__(self, i):
+        """
+        :param i: (int) position in the index
+        :return: Tuple of a read-only view of the impulse responses (length, mics) (a decoded array for encoded blocks) and the unit-norm vector pointing from array to source
+        :rtype: Tuple
+        """
+        entry = self.index[i]
+        if entry['encoded']:
+            # encoded blocks are decoded on the fly instead of mapped
+            data = self._map(entry['file'])[int(entry['offset']):int(entry['offset']) + int(entry['encoded'])]
+            return RIRCodec.decode(data)[:entry['length'], entry['mic_start']:entry['mic_stop']], entry['vec']
+        arr = np.ndarray(tuple(entry['shape']), np.dtype(entry['dtype'].decode()), self._map(entry['file']), int(entry['offset']),
+                         order='F' if entry['fortran'] else 'C')
+        return arr[entry['doa'], :entry['length'], entry['mic_start']:entry['mic_stop']], entry['vec']
+
+    def filter(self, room=None, T60=None, array_type=None):
+        """
+        Function that returns a dataset with the entries of the index that match the given values
+
+        :param room: (str or array) room as in the file names, e.g. '573' or [5,7,3]
+        :param T60: (float) reverberation time
+        :param array_type: (str) one of ULA, CUA, SUA
+        :rtype: RIRDataset
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if room is not None:
+            room = room if isinstance(room, str) else '{:g}{:g}{:g}'.format(*room)
+            mask &= self.index['room'] == room.encode()
+        if T60 is not None:
+            mask &= np.isclose(self.index['T60'], T60)
+        if array_type is not None:
+            mask &= self.index['array_type'] == array_type.encode()
+        subset = self.__getstate__()
+        subset['index'] = self.index[mask]
+        dataset = RIRDataset.__new__(RIRDataset)
+        dataset.__dict__.update(subset)
+        dataset._pid = os.getpid()
+        return dataset
+
+    def sample(self, rng=None):
+        """
+        :param rng: (np.random.Generator) random number generator, a fresh one if None
+        :return: random entry, see __getitem__
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        return self[rng.integers(len(self))]
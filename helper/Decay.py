@@ -0,0 +1,55 @@
+import numpy as np
+
+def schroeder_curve(imp):
+    """
+    Function that computes the energy decay curve of impulse responses by Schroeder backward integration
+
+    :param imp: (array) impulse responses of shape (nsample, M)
+    :return: (array) energy decay curves in dB relative to the total energy of shape (nsample, M)
+    """
+    edc = np.cumsum(np.square(imp)[::-1], axis=0)[::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 10*np.log10(edc/edc[:1])
+
+def decay_length(imp, threshold):
+    """
+    Function that returns the number of samples after which the energy decay curves of all microphones fell below a threshold
+
+    :param imp: (array) impulse responses of shape (nsample, M)
+    :param threshold: (float) energy decay in dB (positive, e.g. 60 for the -60 dB point)
+    :return: (int) length of the impulse responses that keeps the energy above -threshold dB of every microphone, at least 1
+    """
+    imp = np.reshape(imp, (len(imp), -1))
+    edc = np.cumsum(np.square(imp)[::-1], axis=0)[::-1]
+    # the decay curve is non-increasing, so the samples above the threshold form a prefix
+    above = edc >= edc[:1]*10**(-threshold/10)
+    above &= edc > 0
+    return max(1, int(above.sum(axis=0).max()))
+
+def decay_time(imp, rate, start=5, stop=35):
+    """
+    Function that estimates the reverberation time from a line fit of the energy decay curve between two levels, e.g. T30 for 5 to 35 dB
+
+    :param imp: (array) impulse responses of shape (nsample, M)
+    :param rate: (int) sampling frequency
+    :param start: (float) decay in dB where the fit starts
+    :param stop: (float) decay in dB where the fit ends
+    :return: (array) reverberation times in seconds (extrapolated to 60 dB) per microphone
+    """
+    edc = schroeder_curve(np.reshape(imp, (len(imp), -1)))
+    t60 = []
+    for curve in edc.T:
+        idx = np.nonzero((curve <= -start) & (curve >= -stop))[0]
+        slope = np.polyfit(idx/rate, curve[idx], 1)[0]
+        t60.append(-60/slope)
+    return np.array(t60)
+
+def direct_to_reverberant_ratio(imp, direct):
+    """
+    :param imp: (array) impulse responses of shape (nsample, M)
+    :param direct: (array) direct path impulse responses of shape (nsample, M), see helper.DirectPath.direct_path
+    :return: (array) energy ratio of direct path and the rest of the impulse responses in dB per microphone
+    """
+    imp = np.reshape(imp, (len(imp), -1))
+    direct = np.reshape(direct, (len(direct), -1))[:len(imp)]
+    return 10*np.log10(np.sum(direct**2, axis=0)/np.sum((imp - direct)**2, axis=0))
@@ -0,0 +1,74 @@
+import numpy as np
+from scipy.signal import lfilter
+
+def lowpass_kernel(frac, rate):
+    """
+    Hanning-windowed sinc interpolation kernels for fractional delays
+    The kernel is the same low-pass FIR that rir_generator places at every image source (8 ms wide, cut-off at rate/2)
+
+    :param frac: (array) fractional part of the delays in samples, one per microphone
+    :param rate: (int) sampling frequency
+    :return: (array) kernels of shape (len(frac), Tw)
+    """
+    Tw = 2*int(np.floor(0.004*rate + 0.5))
+    t = np.arange(Tw)[None,:] - 0.5*Tw + 1 - np.atleast_1d(frac)[:,None]
+    return 0.5*(1 + np.cos(2*np.pi*t/Tw))*np.sinc(t)
+
+def highpass_filter(imp, rate):
+    """
+    'Original' high-pass filter proposed by Allen and Berkley with a cut-off frequency of 100 Hz, as used by rir_generator
+
+    :param imp: (array) impulse responses of shape (nsample, M), filtered along the first axis
+    :param rate: (int) sampling frequency
+    :return: (array) filtered impulse responses
+    """
+    W = 2*np.pi*100/rate
+    R1 = np.exp(-W)
+    B1 = 2*R1*np.cos(W)
+    B2 = -R1*R1
+    A1 = -(1 + R1)
+    return lfilter([1, A1, R1], [1, -B1, -B2], imp, axis=0)
+
+def direct_path(mics, source, c, rate, nsample, sparse=False):
+    """
+    Function that synthesizes the direct path from a source to all microphones at once
+    Every microphone gets a 1/(4 pi r) gain and a fractional-delay kernel placed at r/c. The result equals rir_generator with order=0.
+
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param source: (array) x,y,z source position
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param nsample: (int) length of the impulse responses
+    :param sparse: (bool) return only delays, gains and kernels instead of the dense impulse responses
+    :return: (array) direct path impulse responses of shape (nsample, M) or, if sparse, a dict with 'delay' (int start sample per microphone), 'gain', 'kernel' and 'nsample' that can be expanded with densify_direct_path
+    """
+    r = np.linalg.norm(np.atleast_2d(mics) - np.reshape(source, (1, 3)), axis=-1)
+    dist = r*rate/c
+    fdist = np.floor(dist)
+    Tw = 2*int(np.floor(0.004*rate + 0.5))
+    direct = {'delay': fdist.astype(int) - Tw//2 + 1,
+              'gain': 1/(4*np.pi*r),
+              'kernel': lowpass_kernel(dist - fdist, rate),
+              'nsample': int(nsample)}
+    # the direct path is dropped by rir_generator if it arrives after the last sample
+    direct['gain'][fdist >= nsample] = 0
+    if sparse:
+        return direct
+    return densify_direct_path(direct, rate)
+
+def densify_direct_path(direct, rate):
+    """
+    Function that expands a sparse direct path as returned by direct_path(..., sparse=True) to dense impulse responses
+
+    :param direct: (dict) sparse direct path with 'delay', 'gain', 'kernel' and 'nsample'
+    :param rate: (int) sampling frequency
+    :return: (array) direct path impulse responses of shape (nsample, M)
+    """
+    nsample = direct['nsample']
+    num_mics, Tw = direct['kernel'].shape
+    imp = np.zeros((nsample, num_mics))
+    idx = direct['delay'][None,:] + np.arange(Tw)[:,None]
+    valid = (idx >= 0) & (idx < nsample)
+    cols = np.broadcast_to(np.arange(num_mics)[None,:], idx.shape)
+    imp[idx[valid], cols[valid]] = (direct['gain'][:,None]*direct['kernel']).T[valid]
+    return highpass_filter(imp, rate)
@@ -0,0 +1,73 @@
+import os
+import numpy as np
+from functools import lru_cache
+from helper import ArrayStructures, UniformSphericalSampling, platonic_solids
+from helper.RIRCache import source_version
+from helper.UniformSphericalSampling import sample_sphere_uniformly_geometric, sample_halfsphere_uniformly_geometric
+
+SAMPLERS = {
+    'ssug': sample_sphere_uniformly_geometric,
+    'shug': sample_halfsphere_uniformly_geometric,
+}
+
+# directory of the on-disk tier shared by all processes, disabled if None
+cache_dir = None
+
+def set_cache_dir(path):
+    """
+    Function that enables the on-disk tier of the cache, e.g. on a directory shared by all workers of a sweep
+
+    :param path: (str) cache directory, None disables the on-disk tier
+    """
+    global cache_dir
+    cache_dir = path
+    if path is not None:
+        os.makedirs(path, exist_ok=True)
+
+def _read_only(arr):
+    arr = np.asarray(arr)
+    arr.setflags(write=False)
+    return arr
+
+def _cached(name, compute):
+    """
+    Function that loads an array from the on-disk tier or computes and stores it there. Files are written atomically, so concurrent workers at most compute the same array twice. The files are kept in a subdirectory per version of the code that computes them, so changed code never loads arrays of the old code
+    """
+    if cache_dir is None:
+        return _read_only(compute())
+    directory = os.path.join(cache_dir, source_version(ArrayStructures, UniformSphericalSampling, platonic_solids)[:16])
+    filename = os.path.join(directory, name + '.npy')
+    if os.path.exists(filename):
+        return _read_only(np.load(filename))
+    arr = _read_only(compute())
+    os.makedirs(directory, exist_ok=True)
+    tmp = '{}.{}.tmp.npy'.format(filename[:-4], os.getpid())
+    np.save(tmp, arr)
+    os.replace(tmp, filename)
+    return arr
+
+@lru_cache(maxsize=128)
+def array_geometry(array_type, dist, num_mics):
+    """
+    Cached version of getattr(ArrayStructures, array_type)(dist, num_mics)
+
+    :param array_type: (str) one of ULA, CUA, SUA
+    :param dist: (float) intermicrophone distance for ULA or radius for CUA, SUA
+    :param num_mics: (int) number of microphones
+    :return: (array) read-only offset vectors of the microphones to the array center
+    """
+    name = '{}_{!r}_{}'.format(array_type, float(dist), int(num_mics))
+    return _cached(name, lambda: getattr(ArrayStructures, array_type)(dist, num_mics))
+
+@lru_cache(maxsize=128)
+def sampling_grid(sampler, N):
+    """
+    Cached version of the geometric sphere and halfsphere samplings
+
+    :param sampler: (str) 'ssug' (sphere) or 'shug' (halfsphere)
+    :param N: (int) number of points
+    :return: read-only azimuth and elevation angles
+    :rtype: float tuple
+    """
+    grid = _cached('{}_{}'.format(sampler, int(N)), lambda: np.stack(SAMPLERS[sampler](N)))
+    return grid[0], grid[1]
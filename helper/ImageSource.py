@@ -0,0 +1,196 @@
+import numpy as np
+from functools import lru_cache
+from helper.DirectPath import lowpass_kernel, highpass_filter
+
+def reflection_coefficients(room, reverberation_time, c):
+    """
+    Function that computes the wall reflection coefficients for a given reverberation time using Sabine's formula, equally for all walls as rir_generator does
+
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_time: (float) T60 of the room in seconds
+    :param c: (float) speed of sound
+    :return: (array) reflection coefficients [beta_x1, beta_x2, beta_y1, beta_y2, beta_z1, beta_z2]
+    """
+    if reverberation_time == 0:
+        return np.zeros(6)
+    room = np.asarray(room, dtype=float)
+    V = np.prod(room)
+    S = 2*np.sum(room[::-1]*np.roll(room[::-1], 1))
+    alpha = 24*np.log(10.0)*V/(c*S*reverberation_time)
+    if alpha > 1:
+        raise ValueError('The reflection coefficients cannot be calculated using the current room parameters, i.e. room size and reverberation time')
+    return np.full(6, np.sqrt(1 - alpha))
+
+def image_sources(source, room, c, rate, nsample, order=-1):
+    """
+    Function that enumerates the image source lattice of a source in a shoebox room
+    Only the geometry is computed: the gain of every image is the product of the reflection coefficients raised to the returned wall reflection counts, so the lattice can be reused for all receivers and reverberation times.
+
+    :param source: (array) x,y,z source position
+    :param room: (array) x,y,z room dimensions
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param nsample: (int) length of the impulse responses, images that cannot arrive in time are not enumerated
+    :param order: (int) maximal reflection order, -1 for all
+    :return: Tuple of image positions in samples (I, 3) and reflection counts per wall (I, 6)
+    :rtype: Tuple
+    """
+    cTs = c/rate
+    s = np.asarray(source, dtype=float)/cTs
+    L = np.asarray(room, dtype=float)/cTs
+    n = np.ceil(nsample/(2*L)).astype(int)
+    pos = []
+    counts = []
+    for dim in range(3):
+        m = np.repeat(np.arange(-n[dim], n[dim] + 1), 2)
+        q = np.tile([0, 1], 2*n[dim] + 1)
+        pos.append((1 - 2*q)*s[dim] + 2*m*L[dim])
+        counts.append(np.stack([np.abs(m - q), np.abs(m), np.abs(2*m - q)], axis=-1))
+    px, py, pz = pos[0][:,None,None], pos[1][None,:,None], pos[2][None,None,:]
+    # images that are farther away from every point of the room than nsample can be skipped
+    center = L/2
+    reach = nsample + np.linalg.norm(L)/2
+    valid = (px - center[0])**2 + (py - center[1])**2 + (pz - center[2])**2 < reach**2
+    if order != -1:
+        valid &= (counts[0][:,None,None,2] + counts[1][None,:,None,2] + counts[2][None,None,:,2]) <= order
+    ix, iy, iz = np.nonzero(valid)
+    images = np.stack([pos[0][ix], pos[1][iy], pos[2][iz]], axis=-1)
+    return images, np.concatenate([counts[0][ix,:2], counts[1][iy,:2], counts[2][iz,:2]], axis=-1)
+
+@lru_cache(maxsize=None)
+def kernel_table(rate, degree=10):
+    """
+    Precomputed polynomial expansion of the fractional-delay kernel
+    The low-pass kernel for a fractional delay u is approximated by sum_p (u-0.5)**p * table[p], which allows accumulating all images with a few weighted histograms followed by one convolution per polynomial degree.
+
+    :param rate: (int) sampling frequency
+    :param degree: (int) degree of the polynomial, 10 approximates the kernel to about 1e-9
+    :return: (array) table of shape (degree+1, Tw)
+    """
+    frac = np.linspace(0, 1, 1025)
+    powers = (frac - 0.5)[:,None]**np.arange(degree + 1)
+    table = np.linalg.lstsq(powers, lowpass_kernel(frac, rate), rcond=None)[0]
+    table.setflags(write=False)
+    return table
+
+def accumulate(mics, images, gains, c, rate, nsample, degree=10, chunk=1<<20, groups=None):
+    """
+    Function that sums the contributions of all image sources at all microphones
+    The geometry (distances, delays and fractional delays) of every image-microphone pair is computed once and reused for all given gain sets, e.g. for several reverberation times.
+
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param images: (array) image positions in samples of shape (I, 3)
+    :param gains: (array) reflection gains of the images of shape (I,) or (I, K) for K gain sets
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param nsample: (int or list of K ints) length of the impulse responses
+    :param degree: (int) degree of the fractional-delay kernel expansion
+    :param chunk: (int) maximal number of image-microphone pairs evaluated at once
+    :param groups: (array) source index of every image of shape (I,) if the images of G sources are accumulated at once, None for one source
+    :return: (array) impulse responses of shape (nsample, M), or (nsample, G*M) with the microphones of source g in columns g*M to (g+1)*M, before high-pass filtering, or a list of K of them
+    """
+    single = np.ndim(gains) == 1
+    gains = np.reshape(gains, (len(gains), -1))
+    nsamples = np.broadcast_to(nsample, gains.shape[1])
+    r = np.atleast_2d(mics)/(c/rate)
+    num_mics = r.shape[0]
+    if groups is None:
+        groups = np.zeros(len(images), dtype=int)
+    # every (source, microphone) pair is one output channel
+    channels = (int(groups.max()) + 1 if len(groups) else 1)*num_mics
+    table = kernel_table(rate, degree)
+    Tw = table.shape[1]
+    hists = [np.zeros((degree + 1, n*channels)) for n in nsamples]
+    step = max(1, chunk//num_mics)
+    for start in range(0, images.shape[0], step):
+        dist = np.linalg.norm(images[start:start+step,None,:] - r[None,...], axis=-1)
+        fdist = np.floor(dist)
+        valid = fdist < nsamples.max()
+        idx = (fdist.astype(int)*channels + groups[start:start+step,None]*num_mics + np.arange(num_mics)[None,:])[valid]
+        spread = (1/(4*np.pi*dist*(c/rate)))[valid]
+        powers = [np.ones_like(spread)]
+        u = (dist - fdist)[valid] - 0.5
+        for p in range(degree):
+            powers.append(powers[-1]*u)
+        img = np.nonzero(valid)[0]
+        for k, n in enumerate(nsamples):
+            keep = idx < n*channels
+            gain = (gains[start:start+step,k][img]*spread)[keep]
+            for p in range(degree + 1):
+                hists[k][p] += np.bincount(idx[keep], weights=gain*powers[p][keep], minlength=n*channels)
+    imps = []
+    for hist, n in zip(hists, nsamples):
+        # every polynomial term is one convolution of its histogram with the respective kernel
+        hist = hist.reshape(degree + 1, n, channels)
+        nfft = int(2**np.ceil(np.log2(n + Tw)))
+        spec = np.einsum('pfm,pf->fm', np.fft.rfft(hist, nfft, axis=1), np.fft.rfft(table, nfft, axis=1))
+        # tap n of a kernel at delay d lands on sample d - Tw/2 + 1 + n
+        imps.append(np.fft.irfft(spec, nfft, axis=0)[Tw//2 - 1:Tw//2 - 1 + n])
+    return imps[0] if single else imps
+
+def generate(c, rate, mics, source, room, reverberation_time, nsample, order=-1, hp_filter=True):
+    """
+    Function that computes room impulse responses with the image source method for omnidirectional microphones, equivalent to rir_generator.generate
+
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param source: (array) x,y,z source position
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_time: (float) T60 of the room in seconds
+    :param nsample: (int) length of the impulse responses
+    :param order: (int) maximal reflection order, -1 for all
+    :param hp_filter: (bool) apply the Allen-Berkley high-pass filter
+    :return: (array) impulse responses of shape (nsample, M)
+    """
+    return generate_multi(c, rate, mics, source, room, [reverberation_time], [nsample], order, hp_filter)[0]
+
+def generate_multi(c, rate, mics, source, room, reverberation_times, nsamples, order=-1, hp_filter=True):
+    """
+    Function that computes room impulse responses of one placement for several reverberation times
+    The image lattice and the image-microphone geometry are computed once for the longest response, only the reflection gains are evaluated per reverberation time.
+
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param source: (array) x,y,z source position
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_times: (list of floats) T60s of the room in seconds
+    :param nsamples: (list of ints) length of the impulse responses per T60
+    :param order: (int) maximal reflection order, -1 for all
+    :param hp_filter: (bool) apply the Allen-Berkley high-pass filter
+    :return: list of impulse responses of shape (nsample, M), one per T60
+    """
+    images, counts = image_sources(source, room, c, rate, max(nsamples), order)
+    gains = np.stack([np.prod(reflection_coefficients(room, T60, c)**counts, axis=-1) for T60 in reverberation_times], axis=-1)
+    imps = accumulate(mics, images, gains, c, rate, list(nsamples))
+    if hp_filter:
+        imps = [highpass_filter(imp, rate) for imp in imps]
+    return imps
+
+def generate_sources(c, rate, mics, sources, room, reverberation_time, nsample, order=-1, hp_filter=True):
+    """
+    Function that computes the room impulse responses of several sources at the same microphones in one pass
+    The image lattices of all sources are accumulated into one histogram per polynomial degree with one channel per (source, microphone) pair, so the receiver geometry, the kernel expansion and the convolution are shared by all sources.
+
+    :param c: (float) speed of sound
+    :param rate: (int) sampling frequency
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param sources: (array) x,y,z source positions of shape (S, 3)
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_time: (float) T60 of the room in seconds
+    :param nsample: (int) length of the impulse responses
+    :param order: (int) maximal reflection order, -1 for all
+    :param hp_filter: (bool) apply the Allen-Berkley high-pass filter
+    :return: (array) impulse responses of shape (S, nsample, M)
+    """
+    beta = reflection_coefficients(room, reverberation_time, c)
+    lattices = [image_sources(source, room, c, rate, nsample, order) for source in np.atleast_2d(sources)]
+    images = np.concatenate([images for images, _ in lattices])
+    gains = np.prod(beta**np.concatenate([counts for _, counts in lattices]), axis=-1)
+    groups = np.repeat(np.arange(len(lattices)), [len(images) for images, _ in lattices])
+    imp = accumulate(mics, images, gains, c, rate, nsample, groups=groups)
+    num_mics = np.atleast_2d(mics).shape[0]
+    if hp_filter:
+        imp = highpass_filter(imp, rate)
+    return imp.reshape(nsample, len(lattices), num_mics).transpose(1, 0, 2)
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import socket
+from contextlib import contextmanager
+
+# statistics of the job that is currently simulated in this process, nothing is recorded if None
+current = None
+
+class JobStats:
+    '''
+    Wall time per stage and counters of one job. Stages are exclusive: time spent in a nested stage is not counted for the enclosing one, so the stage times add up to the time spent in stages
+    '''
+    def __init__(self, **meta):
+        """
+        :param meta: description of the job that is stored with the record, e.g. room, T60 and seed
+        """
+        self.meta = meta
+        self.times = {}
+        self.counters = {}
+        self.stack = []
+        self.start = time.time()
+        self._clock = time.perf_counter()
+
+    def _add(self, name, now):
+        self.times[name] = self.times.get(name, 0.) + now - self.stack[-1][1]
+
+    @contextmanager
+    def stage(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            self._add(self.stack[-1][0], now)
+        self.stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add(name, now)
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] = now
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self):
+        """
+        :return: JSON-serializable record of the job
+        :rtype: dict
+        """
+        return {'job': self.meta, 'host': socket.gethostname(), 'pid': os.getpid(), 'start': self.start,
+                'wall': time.perf_counter() - self._clock, 'stages': self.times, 'counters': self.counters}
+
+@contextmanager
+def stage(name):
+    """
+    Context manager that adds its wall time to a stage of the current job, does nothing outside of a job
+
+    :param name: (str) stage, e.g. 'placement'
+    """
+    if current is None:
+        yield
+    else:
+        with current.stage(name):
+            yield
+
+def count(name, value=1):
+    """
+    Function that increases a counter of the current job, does nothing outside of a job
+
+    :param name: (str) counter, e.g. 'placement_attempts'
+    :param value: (int) increment
+    """
+    if current is not None:
+        current.count(name, value)
+
+@contextmanager
+def job(stats_file=None, **meta):
+    """
+    Context manager that records the stages and counters of one job and appends them as one JSON line to stats_file, also if the job fails
+
+    :param stats_file: (str) JSON lines file shared by all jobs of a sweep, nothing is written if None
+    :param meta: description of the job, see JobStats
+    :return: statistics of the job
+    :rtype: JobStats
+    """
+    global current
+    current = JobStats(**meta)
+    stats = current
+    try:
+        yield stats
+        stats.meta['status'] = 'done'
+    except BaseException:
+        stats.meta['status'] = 'failed'
+        raise
+    finally:
+        current = None
+        if stats_file is not None:
+            write_record(stats_file, stats.record())
+
+def write_record(stats_file, record):
+    """
+    Function that appends a record as a single write, so concurrent jobs do not interleave their lines
+
+    :param stats_file: (str) JSON lines file
+    :param record: (dict) JSON-serializable record
+    """
+    line = (json.dumps(record) + '\n').encode()
+    fd = os.open(stats_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+def read_records(stats_file):
+    """
+    :param stats_file: (str) JSON lines file
+    :return: all complete records, a line cut by a killed job is ignored
+    :rtype: list of dict
+    """
+    records = []
+    if not os.path.exists(stats_file):
+        return records
+    with open(stats_file) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+def aggregate(records, total_jobs=None):
+    """
+    Function that rolls the records of a sweep up into totals, throughput and the estimated remaining time
+
+    :param records: (list of dict) records as written by job
+    :param total_jobs: (int) number of jobs of the whole sweep, no ETA if None
+    :return: dict with the number of done and failed jobs, the summed stage times and counters, the throughput per second of wall clock and the ETA in seconds
+    :rtype: dict
+    """
+    done = [record for record in records if record['job'].get('status') == 'done']
+    summary = {'jobs_done': len(done), 'jobs_failed': len(records) - len(done), 'stages': {}, 'counters': {}}
+    for record in done:
+        for name, value in record['stages'].items():
+            summary['stages'][name] = summary['stages'].get(name, 0.) + value
+        for name, value in record['counters'].items():
+            summary['counters'][name] = summary['counters'].get(name, 0) + value
+    summary['cpu_time'] = sum(record['wall'] for record in done)
+    if not done:
+        return summary
+    # the jobs of a sweep run concurrently, so throughput is measured over the wall clock span of all records
+    span = max(record['start'] + record['wall'] for record in records) - min(record['start'] for record in records)
+    summary['span'] = span
+    summary['jobs_per_s'] = len(done)/span if span > 0 else None
+    summary['throughput'] = {name: value/span for name, value in summary['counters'].items()} if span > 0 else {}
+    summary['workers'] = len(set((record['host'], record['pid']) for record in records))
+    if total_jobs is not None:
+        summary['jobs_total'] = total_jobs
+        remaining = max(0, total_jobs - len(done))
+        summary['eta'] = remaining/summary['jobs_per_s'] if summary['jobs_per_s'] else None
+    return summary
@@ -0,0 +1,103 @@
+import numpy as np
+from helper.DirectPath import lowpass_kernel, highpass_filter
+from helper.ImageSource import reflection_coefficients
+
+def diffuse_coherence(mics, freqs, c):
+    """
+    Function that computes the spatial coherence of a spherically isotropic (diffuse) sound field between all microphone pairs, sin(2 pi f d/c)/(2 pi f d/c) for the distance d of a pair
+
+    :param mics: (array) microphone positions or offsets to the array center of shape (M, 3)
+    :param freqs: (array) frequencies in Hz of shape (F,)
+    :param c: (float) speed of sound
+    :return: (array) coherence matrices of shape (F, M, M)
+    """
+    mics = np.atleast_2d(mics)
+    d = np.linalg.norm(mics[:,None,:] - mics[None,:,:], axis=-1)
+    return np.sinc(2*freqs[:,None,None]*d[None,...]/c)
+
+def coherent_noise(mics, nsample, rate, c, rng):
+    """
+    Function that generates gaussian noise at all microphones with the coherence of a diffuse sound field
+
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param nsample: (int) length of the noise
+    :param rate: (int) sampling frequency
+    :param c: (float) speed of sound
+    :param rng: (np.random.Generator) random number generator
+    :return: (array) noise of shape (nsample, M) with unit variance per microphone
+    """
+    num_mics = np.atleast_2d(mics).shape[0]
+    freqs = np.fft.rfftfreq(nsample, 1/rate)
+    # mixing matrix A with A A^H = coherence at every frequency
+    w, v = np.linalg.eigh(diffuse_coherence(mics, freqs, c))
+    mix = v*np.sqrt(np.clip(w, 0, None))[:,None,:]
+    spec = rng.standard_normal((len(freqs), num_mics)) + 1j*rng.standard_normal((len(freqs), num_mics))
+    noise = np.fft.irfft(np.einsum('fij,fj->fi', mix, spec), nsample, axis=0)
+    return noise/np.maximum(noise.std(axis=0), np.finfo(float).tiny)
+
+def diffuse_energy(room, reverberation_time, nsample, rate, c, order=-1, step=0.001, num_directions=512):
+    """
+    Function that computes the expected energy per sample of the image sources, which is independent of the positions once the sound field is diffuse
+    The images of a source fill space with one image per room volume, so c/rate/V of them arrive per sample at distance r, each with the energy (1/(4 pi r))^2 times its squared wall reflections. An image in direction u has crossed the walls of axis i about r |u_i|/L_i times, the energy is averaged over all directions. Its decay is not exactly exponential and faster than the Sabine reverberation time the reflection coefficients are computed from, as for the full image source model
+
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_time: (float) T60 of the room in seconds
+    :param nsample: (int) number of samples
+    :param rate: (int) sampling frequency
+    :param c: (float) speed of sound
+    :param order: (int) only the images with more reflections than order, all images if -1
+    :param step: (float) time in seconds between two exactly computed values, the others are interpolated
+    :param num_directions: (int) number of directions of the average
+    :return: (array) energy per sample of shape (nsample,), before the high-pass filter
+    """
+    room = np.asarray(room, dtype=float)
+    # mean log reflection coefficient of the two walls of every axis
+    log_beta = np.log(reflection_coefficients(room, reverberation_time, c)).reshape(3, 2).mean(axis=1)
+    # Fibonacci lattice of almost uniformly distributed directions
+    z = 1 - (2*np.arange(num_directions) + 1)/num_directions
+    phi = np.pi*(1 + np.sqrt(5))*np.arange(num_directions)
+    u = np.stack([np.sqrt(1 - z**2)*np.cos(phi), np.sqrt(1 - z**2)*np.sin(phi), z], axis=1)
+    # reflections per meter in every direction
+    crossings = np.abs(u)/room
+    times = np.arange(0, nsample/rate + step, step)
+    energy = np.exp(2*c*times[:,None]*(crossings @ log_beta)[None,:])
+    if order != -1:
+        energy *= c*times[:,None]*crossings.sum(axis=1)[None,:] > order + 0.5
+    # energy of the fractional delay kernel of an image, averaged over the fractional delays
+    kernel = np.mean(np.sum(lowpass_kernel(np.linspace(0, 1, 16, endpoint=False), rate)**2, axis=1))
+    return c/(4*np.pi*np.prod(room)*rate)*kernel*np.interp(np.arange(nsample)/rate, times, energy.mean(axis=1))
+
+def extend_late_reverb(early, mics, room, reverberation_time, nsample, rate, c, rng, order=-1, window=0.01):
+    """
+    Function that extends early room impulse responses by a stochastic late tail
+    The tail is diffuse-field coherent noise with the expected energy of the image sources of all orders, see diffuse_energy. Its level therefore does not depend on the early part and matches the full image source model. Unlike a tail matched to the energy of every microphone and decaying with 60 dB per reverberation_time, all microphones share one envelope and it decays at the rate of the image source model, which is faster than the Sabine reverberation time, so hybrid and full impulse responses agree in decay and direct-to-reverberant ratio. The tail is cross-faded into the last window of the early part. If the early part is limited to low reflection orders, the expected energy of the missing orders is added to it as further noise.
+
+    :param early: (array) exactly computed early impulse responses of shape (nmix, M)
+    :param mics: (array) microphone positions of shape (M, 3)
+    :param room: (array) x,y,z room dimensions
+    :param reverberation_time: (float) T60 of the room in seconds
+    :param nsample: (int) length of the impulse responses
+    :param rate: (int) sampling frequency
+    :param c: (float) speed of sound
+    :param rng: (np.random.Generator) random number generator
+    :param order: (int) maximal reflection order of the early part, -1 for all
+    :param window: (float) length in seconds of the cross-fade
+    :return: (array) impulse responses of shape (nsample, M)
+    """
+    nmix, num_mics = early.shape
+    if nmix >= nsample or reverberation_time == 0:
+        return early[:nsample]
+    if order != -1:
+        missing = diffuse_energy(room, reverberation_time, nmix, rate, c, order)
+        early = early + highpass_filter(coherent_noise(mics, nmix, rate, c, rng), rate)*np.sqrt(missing)[:,None]
+    fade = max(1, min(int(window*rate), nmix//2))
+    # unit-variance noise, high-pass filtered like the image sources
+    noise = highpass_filter(coherent_noise(mics, nsample - nmix + fade, rate, c, rng), rate)
+    tail = noise*np.sqrt(diffuse_energy(room, reverberation_time, nsample, rate, c)[nmix - fade:])[:,None]
+    imp = np.zeros((nsample, num_mics))
+    imp[:nmix] = early
+    # equal-power cross-fade of the uncorrelated early part and tail
+    ramp = np.sin(0.5*np.pi*(np.arange(fade) + 0.5)/fade)[:,None]
+    imp[nmix - fade:nmix] = early[nmix - fade:]*np.sqrt(1 - ramp**2) + tail[:fade]*ramp
+    imp[nmix:] = tail[fade:]
+    return imp
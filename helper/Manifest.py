@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+
+def write_manifest(jobs, filename):
+    """
+    Function that writes the list of all configurations of a sweep as JSON lines. The file is replaced atomically
+
+    :param jobs: (list of namedtuple) configurations including their seeds
+    :param filename: (str) path of the manifest
+    """
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        for job in jobs:
+            f.write(json.dumps(job._asdict()) + '\n')
+    os.replace(tmp, filename)
+
+def read_manifest(filename):
+    """
+    :param filename: (str) path of the manifest
+    :return: configurations as dicts of keyword arguments
+    :rtype: list of dict
+    """
+    with open(filename) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def checksum(filename):
+    """
+    :param filename: (str) file to hash
+    :return: sha256 hex digest of the file content
+    :rtype: str
+    """
+    sha = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def record_done(done_file, filename, sha256):
+    """
+    Function that appends a finished output file and its checksum to the completion log of a manifest
+
+    :param done_file: (str) path of the completion log
+    :param filename: (str) finished output file
+    :param sha256: (str) checksum of the output file
+    """
+    with open(done_file, 'a') as f:
+        f.write(json.dumps({'file': filename, 'sha256': sha256}) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+def completed(done_file):
+    """
+    Function that returns the output files of the completion log that still exist with the recorded checksum
+
+    :param done_file: (str) path of the completion log
+    :return: set of complete output files
+    :rtype: set
+    """
+    if not os.path.exists(done_file):
+        return set()
+    done = {}
+    with open(done_file) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # the last line of a killed sweep may be incomplete
+                continue
+            done[entry['file']] = entry['sha256']
+    return set(filename for filename, sha256 in done.items() if os.path.exists(filename) and checksum(filename) == sha256)
@@ -6,6 +6,78 @@ class Quaternion():
     def __init__(self,w,x,y,z):
         self.vec = np.array([w, x, y,z])
 
+class QuaternionArray():
+    '''
+    Array of K quaternions stored compactly as a (K,4) array with [w, x, y, z] in every row. It is used to rotate whole point sets with one or many quaternions in a single numpy operation
+    '''
+    def __init__(self, vec):
+        self.vec = np.atleast_2d(np.asarray(vec, dtype=float))
+
+    def __len__(self):
+        return self.vec.shape[0]
+
+    @classmethod
+    def from_axis_angle(cls, angles, axes):
+        """
+        Translates rotation angles and rotation axes to quaternions
+
+        :param angles: (float or array of K floats) angles between 0 and 2 pi
+        :param axes: (array of shape (3,) or (K,3)) vectors to rotate around
+        :return: quaternions with rotation information
+        :rtype: QuaternionArray
+        """
+        angles = np.atleast_1d(np.asarray(angles, dtype=float))
+        axes = np.atleast_2d(np.asarray(axes, dtype=float))
+        norm = np.linalg.norm(axes, axis=-1, keepdims=True)
+        if (norm == 0).any():
+            raise ValueError('no rotation axis given ... Error')
+        axes = axes/norm
+        angles, axes = np.broadcast_arrays(angles[:,None], axes)
+        return cls(np.concatenate([np.cos(angles[:,:1]/2), np.sin(angles/2)*axes], axis=-1))
+
+    def __mul__(self, other):
+        """
+        Elementwise (broadcasted) Hamilton product of two quaternion arrays
+
+        :param other: Second quaternion array
+        :type other: QuaternionArray
+        :rtype: QuaternionArray
+        """
+        w1, x1, y1, z1 = np.moveaxis(self.vec, -1, 0)
+        w2, x2, y2, z2 = np.moveaxis(other.vec, -1, 0)
+        return QuaternionArray(np.stack([w1*w2 - x1*x2 - y1*y2 - z1*z2,
+                                         w1*x2 + x1*w2 + y1*z2 - z1*y2,
+                                         w1*y2 - x1*z2 + y1*w2 + z1*x2,
+                                         w1*z2 + x1*y2 - y1*x2 + z1*w2], axis=-1))
+
+    def conjug(self):
+        """
+        :return: conjugated quaternions
+        :rtype: QuaternionArray
+        """
+        return QuaternionArray(self.vec*np.array([1,-1,-1,-1]))
+
+    def to_rotation_matrix(self):
+        """
+        Translates unit quaternions to rotation matrices such that R @ p equals q p q*
+
+        :return: (array (K,3,3)) rotation matrices
+        """
+        w, x, y, z = np.moveaxis(self.vec, -1, 0)
+        return np.stack([np.stack([1 - 2*(y*y + z*z), 2*(x*y - w*z), 2*(x*z + w*y)], axis=-1),
+                         np.stack([2*(x*y + w*z), 1 - 2*(x*x + z*z), 2*(y*z - w*x)], axis=-1),
+                         np.stack([2*(x*z - w*y), 2*(y*z + w*x), 1 - 2*(x*x + y*y)], axis=-1)], axis=-2)
+
+    def rotate(self, points):
+        """
+        Rotates a point set with every quaternion
+
+        :param points: (array (N,3) or (3,)) points to rotate
+        :return: (array (K,N,3)) rotated points
+        """
+        points = np.atleast_2d(points)
+        return points@np.swapaxes(self.to_rotation_matrix(), -1, -2)
+
 class QuatProc():
     '''
     This class processes quaternions
@@ -64,6 +136,22 @@ class QuatProc():
         res_qut = self.multiply(rot_qut,self.multiply(point_qut,self.conjug(rot_qut)))
         return res_qut.vec[1:]
 
+    def rotate_many(self, angles, rotation_axis, points):
+        """
+        Function that rotates a point set around one or many axes in a single operation
+        Vectorized counterpart of rotate: the angles and axes are translated to a QuaternionArray and applied as rotation matrices
+
+        :param angles: (float or array of K floats) angles between 0 and 2 pi
+        :param rotation_axis: (array of shape (3,) or (K,3)) axes to rotate around
+        :param points: (array (N,3)) points to rotate
+        :return: (array) rotated points of shape (N,3) for a single rotation or (K,N,3) for K rotations
+        """
+        rot_quat = QuaternionArray.from_axis_angle(angles, rotation_axis)
+        res = rot_quat.rotate(points)
+        if len(rot_quat) == 1:
+            return res[0]
+        return res
+
     def _get_mul_matrix(self, qut):
         """
         translate quarternion in rotation matrix
@@ -93,13 +181,16 @@ class QuatProc():
         rot_quat = Quaternion(np.cos(angle/2),*(np.sin(angle/2)*rot_ax))
         return rot_quat
 
-    def random_rotation(self):
+    def random_rotation(self, rng=None):
         """
         returns a random rotation vector Be aware that just uniformly creating a random vector is wrong, it has to be sampled from a normal distribution
 
+        :param rng: (np.random.Generator) random number generator, a fresh one if None
         :return rv: vector pointing in a random direction
         :rtype: float array
         """
-        rv = np.random.randn(3)
+        if rng is None:
+            rng = np.random.default_rng()
+        rv = rng.standard_normal(3)
         rv = rv/np.linalg.norm(rv)
         return rv
@@ -0,0 +1,173 @@
+import os
+import pickle
+import hashlib
+import inspect
+import functools
+import numpy as np
+from helper import Instrumentation
+
+def fingerprint(obj, sha=None):
+    """
+    Function that hashes nested tuples, lists, dicts, numpy arrays and scalars by value
+
+    :param obj: object to hash
+    :param sha: hash object that is updated, a new sha256 if None
+    :return: hash object
+    """
+    sha = hashlib.sha256() if sha is None else sha
+    if isinstance(obj, np.ndarray):
+        sha.update('ndarray{}{}'.format(obj.dtype.str, obj.shape).encode())
+        sha.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        sha.update(b'dict')
+        for key in sorted(obj, key=str):
+            fingerprint(key, sha)
+            fingerprint(obj[key], sha)
+    elif isinstance(obj, (list, tuple)):
+        sha.update('{}{}'.format(type(obj).__name__, len(obj)).encode())
+        for item in obj:
+            fingerprint(item, sha)
+    else:
+        if isinstance(obj, np.generic):
+            obj = obj.item()
+        sha.update('{}:{!r}'.format(type(obj).__name__, obj).encode())
+    return sha
+
+class RIRCache:
+    '''
+    Content-addressed cache of generated room impulse responses in a local directory. Entries are written atomically, so concurrent workers at most compute an entry twice. The modification time of an entry is its last use, the least recently used entries are evicted when the cache exceeds its size budget
+    '''
+    def __init__(self, path, max_bytes=50*2**30, check_interval=0.05):
+        """
+        :param path: (str) cache directory
+        :param max_bytes: (int) size budget of the cache
+        :param check_interval: (float) fraction of the budget written by this process after which the size of the cache is checked
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.written = 0
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, key[:2], key + '.pickle')
+
+    def get(self, key):
+        """
+        :param key: (str) hex digest of the inputs
+        :return: cached value, None on a miss
+        """
+        filename = self._file(key)
+        try:
+            with open(filename, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(filename, None)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            # a miss, or an entry that was evicted while it was read
+            return None
+        return value
+
+    def put(self, key, value):
+        """
+        :param key: (str) hex digest of the inputs
+        :param value: picklable value
+        """
+        filename = self._file(key)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, filename)
+        self.written += os.path.getsize(filename)
+        if self.written > self.check_interval*self.max_bytes:
+            self.written = 0
+            self.evict()
+
+    def entries(self):
+        """
+        :return: (list) Tuples of last use, size and name of all entries
+        """
+        entries = []
+        for sub in os.scandir(self.path):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith('.pickle'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self, target=0.9):
+        """
+        Function that removes the least recently used entries if the cache exceeds its budget, until it is below target times the budget
+
+        :param target: (float) fraction of the budget the cache is reduced to
+        :return: (int) number of bytes removed
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for _, size, filename in entries:
+            if total - removed <= target*self.max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                # evicted by another worker
+                pass
+            removed += size
+        return removed
+
+@functools.lru_cache(maxsize=None)
+def source_version(*modules):
+    """
+    Function that hashes the source files of modules, so cached results are invalidated when the code that computed them changes
+
+    :param modules: modules, e.g. helper.ImageSource
+    :return: (str) hex digest of the sources
+    """
+    sha = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+def cached(get_cache, context):
+    """
+    Decorator that looks up the results of a function with an 'rng' argument in an RIRCache. The key is the hash of all arguments, the state of the random number generator and the context. A hit restores the state the generator had after the computation, so the following calls draw the same numbers as without cache. Calls without rng are not reproducible and never cached
+
+    :param get_cache: function that returns the RIRCache, or None to disable the cache
+    :param context: function that returns everything else the results depend on, e.g. configuration and versions
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            rng = bound.arguments.get('rng')
+            if cache is None or rng is None:
+                return func(*args, **kwargs)
+            inputs = {name: value for name, value in bound.arguments.items() if name != 'rng'}
+            key = fingerprint((func.__qualname__, inputs, rng.bit_generator.state, context())).hexdigest()
+            with Instrumentation.stage('cache'):
+                hit = cache.get(key)
+            if hit is not None:
+                Instrumentation.count('cache_hits')
+                result, state = hit
+                rng.bit_generator.state = state
+                return result
+            Instrumentation.count('cache_misses')
+            result = func(*args, **kwargs)
+            with Instrumentation.stage('cache'):
+                cache.put(key, (result, rng.bit_generator.state))
+            return result
+        wrapper.uncached = func
+        return wrapper
+    return decorator
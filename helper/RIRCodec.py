@@ -0,0 +1,152 @@
+import json
+import zlib
+import pickle
+import struct
+import numpy as np
+
+MAGIC = b'RIRC'
+
+def _quantize(block, bits):
+    """
+    Function that quantizes every column of a block uniformly to signed integers of the given bit depth
+
+    :return: Tuple of the integers and the quantization step per column
+    :rtype: Tuple
+    """
+    # in double precision, the largest integers of 32 bits are not exact in single precision
+    block = np.asarray(block, dtype=np.float64)
+    peak = np.max(np.abs(block), axis=0)
+    step = np.where(peak > 0, peak/(2**(bits - 1) - 1), 1.)
+    return np.rint(block/step).astype(np.int16 if bits <= 16 else np.int32), step
+
+def _error(block, q, step):
+    """
+    :return: (float) largest absolute error of the block after decoding to its dtype, which includes its rounding for inputs of low precision
+    """
+    if not block.size:
+        return 0.
+    return float(np.max(np.abs((q*step).astype(block.dtype) - block)))
+
+def _pack(arr, level):
+    # the bytes of equal significance are stored together, which compresses better than interleaved samples
+    planes = np.ascontiguousarray(arr).view(np.uint8).reshape(-1, arr.dtype.itemsize).T
+    return zlib.compress(planes.tobytes(), level)
+
+def _unpack(data, dtype, count):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(dtype.itemsize, count)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+def encode(block, bits=16, early=800, chunk=4096, level=6):
+    """
+    Function that compresses impulse responses. The early part is quantized with one step per microphone and stored as (delay, amplitude) pairs of its non-zero samples, the tail is quantized and deflated in chunks with one step per chunk and microphone, so the decaying tail keeps its relative precision
+
+    :param block: (array) impulse responses of shape (nsample, M)
+    :param bits: (int) bit depth of the quantization, 2 to 32
+    :param early: (int) number of samples of the early part
+    :param chunk: (int) number of samples per tail chunk
+    :param level: (int) zlib compression level
+    :return: (bytes) encoded block, the absolute error of every sample is at most half of the quantization step stored in the header for exact inputs and at most the 'max_error' of the header, measured on the reconstruction, for all inputs
+    """
+    if not 2 <= bits <= 32:
+        raise ValueError('bit depth {} is not between 2 and 32'.format(bits))
+    block = np.asarray(block)
+    block2 = block.reshape(len(block), -1)
+    nsample, num_mics = block2.shape
+    early = min(early, nsample)
+    header = {'shape': block.shape, 'dtype': block.dtype.str, 'bits': bits, 'early': early, 'chunk': chunk, 'chunks': []}
+    payload = []
+    offset = 0
+    def add(data):
+        nonlocal offset
+        payload.append(data)
+        offset += len(data)
+        return [offset - len(data), len(data)]
+    q, step = _quantize(block2[:early], bits)
+    errors = [_error(block2[:early], q, step)]
+    idx = np.flatnonzero(q)
+    header['early_step'] = step.tolist()
+    header['early_count'] = len(idx)
+    # delays are stored as differences to the previous non-zero sample
+    header['early_delay'] = add(_pack(np.diff(idx, prepend=0).astype(np.uint32), level))
+    header['early_amplitude'] = add(_pack(q.ravel()[idx], level))
+    for start in range(early, nsample, chunk):
+        q, step = _quantize(block2[start:start + chunk], bits)
+        errors.append(_error(block2[start:start + chunk], q, step))
+        header['chunks'].append({'start': start, 'step': step.tolist(), 'data': add(_pack(q, level))})
+    header['max_error'] = max(errors)
+    head = json.dumps(header).encode()
+    return MAGIC + struct.pack('<I', len(head)) + head + b''.join(payload)
+
+def read_header(data):
+    """
+    :param data: (bytes) encoded block
+    :return: Tuple of the header dict and the offset of the payload
+    :rtype: Tuple
+    """
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError('not an encoded impulse response block')
+    size, = struct.unpack('<I', bytes(data[4:8]))
+    return json.loads(bytes(data[8:8 + size])), 8 + size
+
+def decode(data, dtype=None):
+    """
+    Function that restores impulse responses encoded with encode
+
+    :param data: (bytes or buffer) encoded block
+    :param dtype: dtype of the result, the dtype of the encoded block if None
+    :return: (array) impulse responses of the encoded shape
+    """
+    header, base = read_header(data)
+    data = memoryview(data)[base:]
+    shape = tuple(header['shape'])
+    nsample = shape[0]
+    num_mics = int(np.prod(shape[1:]))
+    out = np.zeros((nsample, num_mics), dtype=dtype or header['dtype'])
+    qtype = np.int16 if header['bits'] <= 16 else np.int32
+    count = header['early_count']
+    if count:
+        start, length = header['early_delay']
+        idx = np.cumsum(_unpack(data[start:start + length], np.uint32, count))
+        start, length = header['early_amplitude']
+        amp = _unpack(data[start:start + length], qtype, count)
+        early = np.zeros(header['early']*num_mics)
+        early[idx] = amp
+        out[:header['early']] = early.reshape(-1, num_mics)*np.array(header['early_step'])
+    for chunk in header['chunks']:
+        start, length = chunk['data']
+        rows = min(header['chunk'], nsample - chunk['start'])
+        q = _unpack(data[start:start + length], qtype, rows*num_mics).reshape(rows, num_mics)
+        out[chunk['start']:chunk['start'] + rows] = q*np.array(chunk['step'])
+    return out.reshape(shape)
+
+def stack(blocks, dtype=None):
+    """
+    Function that decodes the blocks of all DOAs of a configuration and stacks them, zero-padded to the longest block as in the uncompressed pickles
+
+    :param blocks: (list of bytes) encoded blocks
+    :param dtype: dtype of the result, the encoded dtype if None
+    :return: (array) impulse responses of shape (DOAs, nsample, M)
+    """
+    decoded = [decode(block, dtype) for block in blocks]
+    out = np.zeros((len(decoded), max(len(block) for block in decoded)) + decoded[0].shape[1:], dtype=decoded[0].dtype)
+    for cnt, block in enumerate(decoded):
+        out[cnt, :len(block)] = block
+    return out
+
+def load(filename):
+    """
+    Function that loads a configuration pickle, encoded impulse responses are decoded so the result has the layout of an uncompressed pickle
+
+    :param filename: (str) pickle file written by RIR_write_quaternion
+    :return: dict with 'RIR', 'Dist', 'Vecs', 'DirectRIR' and 'Length'
+    :rtype: dict
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    if 'Codec' in data:
+        data['RIR'] = stack(data['RIR'])
+        if data['DirectRIR'] and not isinstance(data['DirectRIR'][0], dict):
+            data['DirectRIR'] = stack(data['DirectRIR'])
+        del data['Codec']
+    return data
@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+# alignment in bytes of the arrays in a shared memory segment
+ALIGNMENT = 64
+
+def _encode(obj):
+    if isinstance(obj, np.ndarray):
+        return {'__ndarray__': obj.tolist(), 'dtype': obj.dtype.str}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('{} is not serializable'.format(type(obj).__name__))
+
+def _decode(obj):
+    if '__ndarray__' in obj:
+        return np.array(obj['__ndarray__'], dtype=obj['dtype'])
+    return obj
+
+def send(f, message):
+    """
+    Function that writes one message as a line of JSON, numpy arrays of the (small) arguments are written as lists
+
+    :param f: binary file of a socket
+    :param message: (dict) message
+    """
+    f.write(json.dumps(message, default=_encode).encode() + b'\n')
+    f.flush()
+
+def receive(f):
+    """
+    :param f: binary file of a socket
+    :return: (dict) next message, None if the connection was closed
+    """
+    line = f.readline()
+    if not line:
+        return None
+    return json.loads(line, object_hook=_decode)
+
+def to_shared(result):
+    """
+    Function that copies all arrays of a nested result (tuples, lists, dicts) into one new shared memory segment. The segment is not unlinked by this process, its owner is the reader, see from_shared
+
+    :param result: result of a generation function
+    :return: (dict) name of the segment, offset, shape and dtype of every array and the structure of the result with references to the arrays
+    """
+    arrays = []
+    def layout(obj):
+        if isinstance(obj, np.ndarray):
+            arrays.append(obj)
+            return {'__shared__': len(arrays) - 1}
+        if isinstance(obj, (list, tuple)):
+            return [layout(item) for item in obj]
+        if isinstance(obj, dict):
+            return {key: layout(value) for key, value in obj.items()}
+        return obj.item() if isinstance(obj, np.generic) else obj
+    structure = layout(result)
+    offsets = []
+    size = 0
+    for arr in arrays:
+        offsets.append(size)
+        size += -(-arr.nbytes//ALIGNMENT)*ALIGNMENT
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    # the reader unlinks the segment, the resource tracker of this process must not do it again when it exits
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    for arr, offset in zip(arrays, offsets):
+        np.ndarray(arr.shape, arr.dtype, shm.buf, offset)[...] = arr
+    shm.close()
+    return {'shm': shm.name, 'arrays': [(offset, arr.shape, arr.dtype.str) for arr, offset in zip(arrays, offsets)], 'result': structure}
+
+def from_shared(reply):
+    """
+    Function that copies the arrays of a result out of its shared memory segment and unlinks the segment
+
+    :param reply: (dict) reply of to_shared
+    :return: result with the structure of the original, lists of the top level are returned as tuples
+    """
+    shm = shared_memory.SharedMemory(name=reply['shm'])
+    try:
+        arrays = [np.ndarray(shape, dtype, shm.buf, offset).copy() for offset, shape, dtype in reply['arrays']]
+    finally:
+        shm.close()
+        shm.unlink()
+    def restore(obj):
+        if isinstance(obj, dict):
+            if '__shared__' in obj:
+                return arrays[obj['__shared__']]
+            return {key: restore(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [restore(item) for item in obj]
+        return obj
+    result = restore(reply['result'])
+    return tuple(result) if isinstance(result, list) else result
+
+def unlink(name):
+    """
+    Function that removes a shared memory segment if it still exists
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+# generation function of the worker processes, set by _init
+_func = None
+
+def _init(func, initializer):
+    global _func
+    _func = func
+    if initializer is not None:
+        initializer()
+
+def _call(args, kwargs):
+    start = time.perf_counter()
+    result = _func(*args, **kwargs)
+    return to_shared(result), time.perf_counter() - start
+
+def percentiles(values, q=(50, 90, 99)):
+    """
+    :return: (dict) percentiles 'p50', ... and mean of the values, None for no values
+    """
+    if not len(values):
+        return None
+    stats = {'p{}'.format(p): value for p, value in zip(q, np.percentile(values, q).tolist())}
+    stats['mean'] = float(np.mean(values))
+    return stats
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server.rir_server
+        while True:
+            request = receive(self.rfile)
+            if request is None:
+                return
+            reply = server.handle(request)
+            try:
+                send(self.wfile, reply)
+            except OSError:
+                # the client is gone, nobody will unlink its result
+                if 'shm' in reply:
+                    unlink(reply['shm'])
+                return
+            if request.get('op') == 'shutdown':
+                server.server.shutdown()
+                return
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class RIRServer:
+    '''
+    Local server that keeps a pool of worker processes with imported modules, backends and geometry caches warm and runs a generation function for clients on a Unix domain socket (see RIRClient). Requests and replies are lines of JSON, the arrays of a result are passed in a shared memory segment instead of the reply. Every connection is served by a thread, so requests of several clients are queued for the workers
+    '''
+    def __init__(self, path, func, workers=0, initializer=None, window=1000):
+        """
+        :param path: (str) path of the Unix domain socket
+        :param func: function that is called with the arguments of a request and returns a (nested tuple of) arrays, module level so that the workers can call it
+        :param workers: (int) number of worker processes, 0 uses all cores
+        :param initializer: function that every worker calls once after start, e.g. to warm up caches
+        :param window: (int) number of latest requests the latency percentiles are computed over
+        """
+        self.path = path
+        self.workers = workers or os.cpu_count()
+        # workers are forked before the server starts threads
+        self.pool = multiprocessing.Pool(self.workers, _init, (func, initializer))
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.served = 0
+        self.errors = 0
+        self.latency = deque(maxlen=window)
+        self.generate = deque(maxlen=window)
+        self.segments = set()
+        self.start = time.time()
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(path)
+            except ConnectionRefusedError:
+                # socket of a server that died
+                os.remove(path)
+            else:
+                probe.close()
+                raise RuntimeError('a server is already running on {}'.format(path))
+        self.server = _UnixServer(path, _Handler)
+        self.server.rir_server = self
+
+    def handle(self, request):
+        """
+        :param request: (dict) 'op' one of 'generate' (with 'args' and 'kwargs' of the generation function), 'stats' or 'shutdown'
+        :return: (dict) reply, 'error' if the request failed
+        """
+        op = request.get('op')
+        if op == 'stats':
+            return self.stats()
+        if op == 'shutdown':
+            return {'shutdown': True}
+        if op != 'generate':
+            return {'error': 'unknown op {!r}'.format(op)}
+        start = time.perf_counter()
+        with self.lock:
+            self.in_flight += 1
+        try:
+            reply, duration = self.pool.apply_async(_call, (request.get('args', []), request.get('kwargs', {}))).get()
+        except Exception as e:
+            with self.lock:
+                self.errors += 1
+            return {'error': '{}: {}'.format(type(e).__name__, e)}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        with self.lock:
+            self.served += 1
+            self.segments.add(reply['shm'])
+            self.generate.append(duration)
+            self.latency.append(time.perf_counter() - start)
+        return reply
+
+    def stats(self):
+        """
+        :return: (dict) number of workers, requests in flight and waiting for a worker (queue depth), served and failed requests, and percentiles of the latency of the latest requests and of the generation time within it in seconds
+        """
+        with self.lock:
+            return {'workers': self.workers, 'in_flight': self.in_flight, 'queued': max(0, self.in_flight - self.workers),
+                    'served': self.served, 'errors': self.errors, 'uptime': time.time() - self.start,
+                    'latency': percentiles(list(self.latency)), 'generate': percentiles(list(self.generate))}
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Function that stops the workers and removes the socket and the results that no client has read
+        """
+        self.server.server_close()
+        self.pool.terminate()
+        for name in self.segments:
+            unlink(name)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class RIRClient:
+    '''
+    Client of an RIRServer, one connection that can be shared by threads
+    '''
+    def __init__(self, path, timeout=None):
+        """
+        :param path: (str) path of the Unix domain socket of the server
+        :param timeout: (float) seconds to wait for a reply, forever if None
+        """
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.settimeout(timeout)
+        self.sock.connect(path)
+        self.file = self.sock.makefile('rwb')
+        self.lock = threading.Lock()
+
+    def request(self, message):
+        """
+        :param message: (dict) request, see RIRServer.handle
+        :return: (dict) reply
+        """
+        with self.lock:
+            send(self.file, message)
+            reply = receive(self.file)
+        if reply is None:
+            raise ConnectionError('server closed the connection')
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    def call(self, *args, **kwargs):
+        """
+        Function that runs the generation function of the server, arguments must be JSON serializable or numpy arrays
+
+        :return: result of the generation function
+        """
+        return from_shared(self.request({'op': 'generate', 'args': args, 'kwargs': kwargs}))
+
+    def generate_rir(self, *args, seed=None, **kwargs):
+        """
+        Function with the arguments of RIR_write_quaternion.generate_rir for a server started by RIR_server.py, rng is replaced by the seed of a new generator
+
+        :param seed: (int) seed of the random number generator of the placement, a fresh one if None
+        :return: Tuple of a unit-norm vector pointing from array to source, the room impulse responses and the direct path impulse responses
+        :rtype: Tuple
+        """
+        return self.call(*args, seed=seed, **kwargs)
+
+    def stats(self):
+        """
+        :return: (dict) see RIRServer.stats
+        """
+        return self.request({'op': 'stats'})
+
+    def shutdown(self):
+        self.request({'op': 'shutdown'})
+
+    def close(self):
+        self.file.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
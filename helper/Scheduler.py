@@ -0,0 +1,132 @@
+import heapq
+import numpy as np
+from scipy.optimize import nnls
+
+# names of the features of the cost model, see features
+FEATURES = ['job', 'doa', 'sample', 'image']
+
+# seconds per unit of every feature before calibration, measured with the rir_generator backend on one core
+DEFAULT_COEFFICIENTS = [0.01, 0.015, 4.5e-7, 3.8e-6]
+
+def features(room, reverberation_times, num_mics, doa_count, rate=16000, c=343, mixing_time=None):
+    """
+    Function that computes the features the cost of a job is linear in: a constant per job and per DOA, the number of samples (copying, direct path, serialization) and the number of image source contributions (synthesis). The number of image sources within the length of an impulse response grows with the cube of that length over the room volume
+
+    :param room: (array) x, y, z dimension of the room
+    :param reverberation_times: (list of floats) reverberation times of the job, all computed for every DOA
+    :param num_mics: (int) number of microphones
+    :param doa_count: (int) number of DOAs of the job
+    :param rate: (int) sampling frequency
+    :param c: (float) speed of sound
+    :param mixing_time: (float) time after which the image sources are replaced by a noise tail, see RIR_write_quaternion.synthesize
+    :return: (array) features in the order of FEATURES
+    """
+    volume = float(np.prod(room))
+    samples = images = 0.
+    for T60 in reverberation_times:
+        samples += num_mics*T60*rate
+        length = T60 if mixing_time is None else min(T60, mixing_time)
+        images += num_mics*4/3*np.pi*(c*length)**3/volume
+    return np.array([1., doa_count, doa_count*samples, doa_count*images])
+
+def output_size(reverberation_times, num_mics, doa_count, rate=16000, itemsize=8, sparse_direct=False):
+    """
+    :return: (int) upper bound of the number of bytes a job writes, impulse responses truncated at their decay threshold or compressed are shorter
+    """
+    blocks = 1 if sparse_direct else 2
+    return int(sum(doa_count*int(T60*rate)*num_mics*itemsize*blocks for T60 in reverberation_times))
+
+class CostModel:
+    '''
+    Linear model of the wall time of a job in its features (see features), calibrated from the job records of helper.Instrumentation
+    '''
+    def __init__(self, coefficients=DEFAULT_COEFFICIENTS, rate=16000, c=343, mixing_time=None):
+        """
+        :param coefficients: (list) seconds per unit of every feature
+        :param rate: (int) sampling frequency
+        :param c: (float) speed of sound
+        :param mixing_time: (float) mixing time of the hybrid synthesis, None if all image sources are computed
+        """
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.rate = rate
+        self.c = c
+        self.mixing_time = mixing_time
+        self.calibrated = 0
+
+    def _features(self, room, reverberation_times, num_mics, doa_count):
+        return features(room, reverberation_times, num_mics, doa_count, self.rate, self.c, self.mixing_time)
+
+    def fit(self, records, min_records=8):
+        """
+        Function that calibrates the coefficients by a non-negative least squares fit of the relative error to the wall times of finished jobs. Jobs with cache hits are left out, they are cheaper than their features say
+
+        :param records: (list of dict) records as written by helper.Instrumentation.job
+        :param min_records: (int) minimal number of usable records, the coefficients are kept with fewer
+        :return: (int) number of records the model is calibrated with
+        """
+        X, y = [], []
+        for record in records:
+            job = record['job']
+            if job.get('status') != 'done' or record['counters'].get('cache_hits') or not record['wall'] > 0:
+                continue
+            X.append(self._features(job['room'], job['T60'], job['num_mics'], job['doa_count']))
+            y.append(record['wall'])
+        if len(y) < max(min_records, len(FEATURES)):
+            return 0
+        X, y = np.array(X), np.array(y)
+        coefficients, _ = nnls(X/y[:,None], np.ones(len(y)))
+        if not coefficients.any():
+            return 0
+        self.coefficients = coefficients
+        self.calibrated = len(y)
+        return self.calibrated
+
+    def predict(self, room, reverberation_times, num_mics, doa_count):
+        """
+        :return: (float) estimated wall time of a job in seconds
+        """
+        return float(self._features(room, reverberation_times, num_mics, doa_count) @ self.coefficients)
+
+def split(doa_count, parts):
+    """
+    :return: (list) ranges (start, stop) of parts of almost equal number of DOAs
+    """
+    bounds = np.linspace(0, doa_count, min(parts, doa_count) + 1).round().astype(int)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+def makespan(costs, workers):
+    """
+    Function that simulates the greedy assignment of jobs in the given order to the next free worker, as done by a process pool or a work queue
+
+    :param costs: (list of float) costs of the jobs in the order they are started
+    :param workers: (int) number of workers
+    :return: (float) time until the last job finishes
+    """
+    finish = [0.]*workers
+    for cost in costs:
+        heapq.heappush(finish, heapq.heappop(finish) + cost)
+    return max(finish)
+
+def plan(jobs, cost, doa_counts, workers, parts_per_worker=4, splittable=True):
+    """
+    Function that orders jobs longest-first and splits the jobs that would straggle at DOA granularity. A job is split into parts of at most the total cost over parts_per_worker times workers, so the longest parts start first and the short ones fill the gaps at the end
+
+    :param jobs: (list) jobs
+    :param cost: function of a job and a number of DOAs that returns the estimated cost of that many DOAs of the job
+    :param doa_counts: (list of int) number of DOAs of every job
+    :param workers: (int) number of workers
+    :param parts_per_worker: (int) number of parts per worker the total cost is divided into for the maximal part cost
+    :param splittable: (bool) split jobs, False only orders them
+    :return: (list) Tuples of job, DOA range (start, stop) or None for the whole job, and estimated cost, longest first
+    """
+    costs = [cost(job, doa_count) for job, doa_count in zip(jobs, doa_counts)]
+    target = sum(costs)/(parts_per_worker*workers)
+    tasks = []
+    for job, doa_count, job_cost in zip(jobs, doa_counts, costs):
+        parts = int(min(np.ceil(job_cost/target), doa_count)) if splittable and target > 0 else 1
+        if parts <= 1:
+            tasks.append((job, None, job_cost))
+            continue
+        for start, stop in split(doa_count, parts):
+            tasks.append((job, (start, stop), cost(job, stop - start)))
+    return sorted(tasks, key=lambda task: -task[2])
@@ -0,0 +1,192 @@
+import os
+import glob
+import zlib
+import socket
+import numpy as np
+
+# one record per stored block, shard files are referenced by name relative to the store
+INDEX_DTYPE = np.dtype([
+    ('shard', 'S64'),
+    ('offset', '<i8'),
+    ('length', '<i4'),
+    ('num_mics', '<i4'),
+    ('dtype', 'S8'),
+    ('target', 'S16'),
+    ('room', '<f8', (3,)),
+    ('T60', '<f8'),
+    ('array_type', 'S8'),
+    ('dmic', '<f8'),
+    ('distance', '<f8'),
+    ('doa', '<f8', (3,)),
+    ('rep', '<i4'),
+    ('seed', '<u8'),
+    ('crc32', '<u4'),
+])
+
+def default_writer_id():
+    """
+    :return: id that is unique for every process on every node, used to name the shard and index files of a writer
+    :rtype: str
+    """
+    return '{}-{}'.format(socket.gethostname(), os.getpid())
+
+class ShardWriter:
+    '''
+    Appends room impulse response blocks of ragged length (length, num_mics) to large memory-mappable shard files of a store directory. Every writer process owns its own shard and index files, so several workers can write to the same store without locking. Blocks become visible to readers only after commit
+    '''
+    def __init__(self, path, writer_id=None, dtype=np.float64, shard_size=1 << 30):
+        """
+        :param path: (str) directory of the store
+        :param writer_id: (str) prefix of the files of this writer, unique per process if None
+        :param dtype: dtype the blocks are stored with
+        :param shard_size: (int) number of bytes after which a new shard file is started
+        """
+        self.path = path
+        self.writer_id = default_writer_id() if writer_id is None else writer_id
+        self.dtype = np.dtype(dtype)
+        self.shard_size = shard_size
+        self.pending = []
+        self.bytes_written = 0
+        os.makedirs(path, exist_ok=True)
+        shards = sorted(glob.glob(os.path.join(path, '{}_*.bin'.format(self.writer_id))))
+        self.shard_num = int(shards[-1].rsplit('_', 1)[-1][:-4]) if shards else 0
+        self._open_shard()
+        self.index = open(os.path.join(path, 'index_{}.idx'.format(self.writer_id)), 'ab')
+
+    def _open_shard(self):
+        self.shard_name = '{}_{:05d}.bin'.format(self.writer_id, self.shard_num)
+        self.shard = open(os.path.join(self.path, self.shard_name), 'ab')
+
+    def append(self, block, target, room, T60, array_type, dmic, distance, doa, rep, seed):
+        """
+        Function that appends one block to the current shard. The block is written from its own buffer without an intermediate copy if it is contiguous and has the dtype of the store
+
+        :param block: (array) impulse responses of shape (length, num_mics)
+        :param target: (str) 'RIR' or 'DirectRIR'
+        :param room: (array) x,y,z room dimensions
+        :param T60: (float) reverberation time
+        :param array_type: (str) one of ULA, CUA, SUA
+        :param dmic: (float) inter-microphone distance (ULA) or radius (CUA, SUA)
+        :param distance: (float) source array-center distance
+        :param doa: (array) unit-norm vector from array to source
+        :param rep: (int) repetition index of the configuration
+        :param seed: (int) seed of the configuration
+        """
+        block = np.ascontiguousarray(block, dtype=self.dtype)
+        if self.shard.tell() > 0 and self.shard.tell() + block.nbytes > self.shard_size:
+            self.shard.close()
+            self.shard_num += 1
+            self._open_shard()
+        record = np.zeros((), dtype=INDEX_DTYPE)
+        record['shard'] = self.shard_name
+        record['offset'] = self.shard.tell()
+        record['length'], record['num_mics'] = block.reshape(block.shape[0], -1).shape
+        record['dtype'] = self.dtype.str
+        record['target'] = target
+        record['room'] = room
+        record['T60'] = T60
+        record['array_type'] = array_type
+        record['dmic'] = dmic
+        record['distance'] = distance
+        record['doa'] = doa
+        record['rep'] = rep
+        record['seed'] = 0 if seed is None else int(seed)
+        data = memoryview(block).cast('B')
+        record['crc32'] = zlib.crc32(data)
+        self.shard.write(data)
+        self.bytes_written += block.nbytes
+        self.pending.append(record)
+
+    def commit(self):
+        """
+        Function that makes all appended blocks visible: the shard data is synced before the index records are written
+        """
+        if not self.pending:
+            return
+        self.shard.flush()
+        os.fsync(self.shard.fileno())
+        self.index.write(np.array(self.pending, dtype=INDEX_DTYPE).tobytes())
+        self.index.flush()
+        os.fsync(self.index.fileno())
+        self.pending = []
+
+    def close(self):
+        """
+        Function that commits the pending blocks and closes the files
+        """
+        self.commit()
+        self.shard.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # blocks of a failed job stay invisible
+            self.pending = []
+        self.close()
+
+class ShardReader:
+    '''
+    Reads the blocks of a store as zero-copy views into memory-mapped shards. The index of all writers is loaded once and can be filtered without touching the shards
+    '''
+    def __init__(self, path):
+        """
+        :param path: (str) directory of the store
+        """
+        self.path = path
+        records = []
+        for filename in sorted(glob.glob(os.path.join(path, 'index_*.idx'))):
+            raw = np.fromfile(filename, dtype=np.uint8)
+            # an index record that was cut by a killed writer is ignored
+            usable = raw.size - raw.size % INDEX_DTYPE.itemsize
+            records.append(raw[:usable].view(INDEX_DTYPE))
+        self.index = np.concatenate(records) if records else np.zeros(0, dtype=INDEX_DTYPE)
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def _map(self, shard, end):
+        # shards that grew since they were mapped are mapped again
+        if shard not in self._maps or len(self._maps[shard]) < end:
+            self._maps[shard] = np.memmap(os.path.join(self.path, shard.decode()), dtype=np.uint8, mode='r')
+        return self._maps[shard]
+
+    def __getitem__(self, i):
+        """
+        :param i: (int) position in the index
+        :return: (array) read-only view of the block of shape (length, num_mics)
+        """
+        record = self.index[i]
+        dtype = np.dtype(record['dtype'].decode())
+        nbytes = int(record['length'])*int(record['num_mics'])*dtype.itemsize
+        data = self._map(record['shard'], record['offset'] + nbytes)[record['offset']:record['offset'] + nbytes]
+        return data.view(dtype).reshape(record['length'], record['num_mics'])
+
+    def select(self, **filters):
+        """
+        Function that returns the positions of all index records that match the given fields, e.g. select(target='RIR', T60=0.38)
+
+        :return: (array) positions in the index
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        for field, value in filters.items():
+            values = self.index[field]
+            if values.dtype.kind == 'S':
+                value = str(value).encode()
+            if values.ndim > 1:
+                mask &= (values == np.asarray(value)).all(axis=-1)
+            else:
+                mask &= values == value
+        return np.nonzero(mask)[0]
+
+    def verify(self, i):
+        """
+        :param i: (int) position in the index
+        :return: True if the stored block matches its checksum
+        :rtype: bool
+        """
+        block = self[i]
+        return zlib.crc32(memoryview(np.ascontiguousarray(block)).cast('B')) == self.index[i]['crc32']
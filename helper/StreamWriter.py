@@ -0,0 +1,447 @@
+import os
+import time
+import queue
+import pickle
+import pickletools
+import shutil
+import struct
+import threading
+import numpy as np
+from helper.ShardStore import ShardWriter
+from helper import RIRCodec
+
+class _Placeholder:
+    '''
+    Stand-in for a stacked array of a PickleStreamWriter that pickles exactly like a C-contiguous array of its dtype and shape with protocol 5, but with a one-byte out-of-band buffer instead of its content. The content is inserted from the temporary files, so the array is never allocated
+    '''
+    def __init__(self, dtype, shape):
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.nbytes = self.dtype.itemsize*int(np.prod(self.shape))
+        self.buffer = bytearray(1)
+
+    @property
+    def address(self):
+        return np.frombuffer(self.buffer, dtype=np.uint8).ctypes.data
+
+    def __reduce_ex__(self, protocol):
+        # the reconstructor numpy uses for out-of-band arrays
+        reconstruct, _ = np.empty(0, dtype=self.dtype).__reduce_ex__(5)
+        return reconstruct, (pickle.PickleBuffer(self.buffer), self.dtype, self.shape, 'C')
+
+class PickleStreamWriter:
+    '''
+    Writes the pickle of one configuration ({'RIR', 'Dist', 'Vecs', 'DirectRIR', 'Length'}) incrementally: every DOA block is appended to a temporary raw file as soon as it is generated, so only one DOA is held in memory. At the end the pickle is streamed from these files and moved to its final name atomically, a killed job therefore never leaves a valid-looking file. The result loads with pickle.load exactly as a pickle of the whole dict. DOA blocks of different length (truncated impulse responses) are zero-padded to the longest one, their actual lengths are stored as 'Length'
+    '''
+    def __init__(self, filename, doa_count, dist, sparse_direct=False, chunk_size=1 << 24):
+        """
+        :param filename: (str) final name of the pickle file
+        :param doa_count: (int) number of DOA blocks that will be appended
+        :param dist: (float) inter-microphone distance (ULA) or radius (CUA, SUA) stored as 'Dist'
+        :param sparse_direct: (bool) the direct paths are sparse dicts that are kept as list
+        :param chunk_size: (int) number of bytes copied at once from the temporary files to the pickle
+        """
+        self.filename = filename
+        self.doa_count = doa_count
+        self.dist = dist
+        self.sparse_direct = sparse_direct
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.bytes_written = 0
+        self.vecs = []
+        self.direct = []
+        self.files = {}
+        self.layout = {}
+        self.lengths = {}
+
+    def _tmp_name(self, key):
+        return self.filename + '.{}.tmp'.format(key)
+
+    def _write_block(self, key, block):
+        block = np.ascontiguousarray(block)
+        if key not in self.files:
+            self.files[key] = open(self._tmp_name(key), 'wb')
+            self.layout[key] = (block.dtype, block.shape[1:])
+            self.lengths[key] = []
+        elif self.layout[key] != (block.dtype, block.shape[1:]):
+            raise ValueError('DOA block {} of {} has shape {} instead of (nsample,) + {}'.format(self.count, key, block.shape, self.layout[key][1]))
+        self.files[key].write(memoryview(block).cast('B'))
+        self.lengths[key].append(block.shape[0])
+
+    def append(self, vec, rir, dirrir):
+        """
+        :param vec: (array) unit-norm vector pointing from array to source
+        :param rir: (array) room impulse responses of shape (nsample, M)
+        :param dirrir: direct path impulse responses of shape (nsample, M) or sparse dict
+        """
+        self._write_block('RIR', rir)
+        if self.sparse_direct:
+            self.direct.append(dirrir)
+        else:
+            self._write_block('DirectRIR', dirrir)
+        self.vecs.append(vec)
+        self.count += 1
+
+    def close(self):
+        """
+        Function that writes the final pickle and removes the temporary files, which are also removed if DOAs are missing
+        """
+        if self.count != self.doa_count:
+            self.abort()
+            raise ValueError('{} of {} DOAs written to {}'.format(self.count, self.doa_count, self.filename))
+        for f in self.files.values():
+            f.close()
+        # the stacked arrays are only placeholders of their header, their content is copied from the temporary files
+        arrays = {key: _Placeholder(dtype, (self.count, max(self.lengths[key])) + shape)
+                  for key, (dtype, shape) in self.layout.items()}
+        data = {'RIR': arrays['RIR'], 'Dist': self.dist, 'Vecs': self.vecs,
+                'DirectRIR': self.direct if self.sparse_direct else arrays['DirectRIR'],
+                'Length': self.lengths['RIR']}
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            self._dump(data, arrays, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+        self.bytes_written = os.path.getsize(self.filename)
+        del data, arrays
+        self._remove_files()
+
+    def _dump(self, data, arrays, f):
+        """
+        Function that pickles data with the large arrays as out-of-band buffers and writes the stream with these buffers inserted in-band from the temporary files
+        """
+        addresses = {arr.address: key for key, arr in arrays.items()}
+        keys = []
+        def out_of_band(buf):
+            key = addresses.get(np.frombuffer(buf.raw(), dtype=np.uint8).ctypes.data)
+            if key is None:
+                return True
+            keys.append(key)
+            return False
+        stream = pickle.dumps(data, protocol=5, buffer_callback=out_of_band)
+        ops = list(pickletools.genops(stream))
+        skip_readonly = False
+        for cnt, (opcode, arg, pos) in enumerate(ops):
+            end = ops[cnt + 1][2] if cnt + 1 < len(ops) else len(stream)
+            # frames are optional for the unpickler
+            if opcode.name == 'FRAME':
+                continue
+            # the inserted buffer is loaded writable as for a plain array
+            if opcode.name == 'READONLY_BUFFER' and skip_readonly:
+                skip_readonly = False
+                continue
+            skip_readonly = False
+            if opcode.name == 'NEXT_BUFFER':
+                key = keys.pop(0)
+                f.write(pickle.BYTEARRAY8 + struct.pack('<Q', arrays[key].nbytes))
+                self._copy_padded(key, f)
+                skip_readonly = True
+                continue
+            f.write(stream[pos:end])
+
+    def _copy_padded(self, key, f):
+        """
+        Function that copies the DOA blocks of a temporary file to the pickle, every block zero-padded to the longest one
+        """
+        dtype, shape = self.layout[key]
+        row = dtype.itemsize*int(np.prod(shape))
+        longest = max(self.lengths[key])
+        with open(self._tmp_name(key), 'rb') as src:
+            if min(self.lengths[key]) == longest:
+                shutil.copyfileobj(src, f, self.chunk_size)
+                return
+            for length in self.lengths[key]:
+                for size in self._chunks(length*row):
+                    f.write(src.read(size))
+                for size in self._chunks((longest - length)*row):
+                    f.write(bytes(size))
+
+    def _chunks(self, nbytes):
+        for start in range(0, nbytes, self.chunk_size):
+            yield min(self.chunk_size, nbytes - start)
+
+    def abort(self):
+        """
+        Function that removes all temporary files of an unfinished configuration
+        """
+        for f in self.files.values():
+            f.close()
+        self._remove_files()
+        if os.path.exists(self.filename + '.tmp'):
+            os.remove(self.filename + '.tmp')
+
+    def _remove_files(self):
+        for key in self.files:
+            os.remove(self._tmp_name(key))
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class CodecStreamWriter:
+    '''
+    Writes the pickle of one configuration with every DOA block compressed by helper.RIRCodec as soon as it is generated. 'RIR' and 'DirectRIR' are lists of encoded blocks and 'Codec' holds the codec parameters, helper.RIRCodec.load restores the layout of an uncompressed pickle. As for PickleStreamWriter, the encoded blocks are appended to temporary files and streamed into the pickle at the end, so only one DOA is held in memory. The pickle is written without frames, so the encoded blocks can be located in the file by helper.DatasetReader
+    '''
+    def __init__(self, filename, doa_count, dist, sparse_direct=False, bits=16, early=800, chunk=4096, chunk_size=1 << 24):
+        """
+        :param filename: (str) final name of the pickle file
+        :param doa_count: (int) number of DOA blocks that will be appended
+        :param dist: (float) inter-microphone distance (ULA) or radius (CUA, SUA) stored as 'Dist'
+        :param sparse_direct: (bool) the direct paths are sparse dicts that are stored uncompressed
+        :param bits: (int) bit depth of the quantization, see helper.RIRCodec.encode
+        :param early: (int) number of samples of the early part
+        :param chunk: (int) number of samples per tail chunk
+        :param chunk_size: (int) number of bytes copied at once from the temporary files to the pickle
+        """
+        self.filename = filename
+        self.doa_count = doa_count
+        self.dist = dist
+        self.sparse_direct = sparse_direct
+        self.chunk_size = chunk_size
+        self.codec = {'name': 'rirc', 'bits': bits, 'early': early, 'chunk': chunk}
+        self.bytes_written = 0
+        self.vecs = []
+        self.direct = []
+        self.lengths = []
+        self.files = {}
+        self.sizes = {}
+
+    def _tmp_name(self, key):
+        return self.filename + '.{}.tmp'.format(key)
+
+    def _encode(self, block):
+        return RIRCodec.encode(block, self.codec['bits'], self.codec['early'], self.codec['chunk'])
+
+    def _write_block(self, key, data):
+        if key not in self.files:
+            self.files[key] = open(self._tmp_name(key), 'wb')
+            self.sizes[key] = []
+        self.files[key].write(data)
+        self.sizes[key].append(len(data))
+
+    def append(self, vec, rir, dirrir):
+        """
+        :param vec: (array) unit-norm vector pointing from array to source
+        :param rir: (array) room impulse responses of shape (nsample, M)
+        :param dirrir: direct path impulse responses of shape (nsample, M) or sparse dict
+        """
+        self.append_encoded(vec, self._encode(rir), dirrir if self.sparse_direct else self._encode(dirrir), len(rir))
+
+    def append_encoded(self, vec, rir, dirrir, length):
+        """
+        Function that appends a DOA block that is already encoded with the parameters of this writer, e.g. when parts of a configuration are merged
+
+        :param vec: (array) unit-norm vector pointing from array to source
+        :param rir: (bytes) encoded room impulse responses
+        :param dirrir: encoded direct path impulse responses or sparse dict
+        :param length: (int) number of samples of the impulse responses
+        """
+        self._write_block('RIR', rir)
+        if self.sparse_direct:
+            self.direct.append(dirrir)
+        else:
+            self._write_block('DirectRIR', dirrir)
+        self.vecs.append(vec)
+        self.lengths.append(length)
+
+    def close(self):
+        """
+        Function that writes the final pickle and removes the temporary files, which are also removed if DOAs are missing
+        """
+        if len(self.vecs) != self.doa_count:
+            self.abort()
+            raise ValueError('{} of {} DOAs written to {}'.format(len(self.vecs), self.doa_count, self.filename))
+        for f in self.files.values():
+            f.close()
+        # the encoded blocks are pickled as unique short placeholders that are replaced by the blocks of the temporary files
+        prefix = os.urandom(16)
+        placeholders = {key: [prefix + '{}:{}'.format(key, cnt).encode() for cnt in range(len(sizes))] for key, sizes in self.sizes.items()}
+        data = {'RIR': placeholders.get('RIR', []), 'Dist': self.dist, 'Vecs': self.vecs,
+                'DirectRIR': self.direct if self.sparse_direct else placeholders.get('DirectRIR', []),
+                'Length': self.lengths, 'Codec': self.codec}
+        tmp = self.filename + '.tmp'
+        with open(tmp, 'wb') as f:
+            self._dump(data, placeholders, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.filename)
+        self.bytes_written = os.path.getsize(self.filename)
+        self._remove_files()
+
+    def _dump(self, data, placeholders, f):
+        """
+        Function that pickles data with protocol 3 and writes the stream with every placeholder replaced by its encoded block
+        """
+        blocks = {placeholder: (key, cnt) for key, names in placeholders.items() for cnt, placeholder in enumerate(names)}
+        stream = pickle.dumps(data, protocol=3)
+        ops = list(pickletools.genops(stream))
+        sources = {key: open(self._tmp_name(key), 'rb') for key in self.sizes}
+        try:
+            for cnt, (opcode, arg, pos) in enumerate(ops):
+                end = ops[cnt + 1][2] if cnt + 1 < len(ops) else len(stream)
+                if opcode.name in ('BINBYTES', 'SHORT_BINBYTES') and arg in blocks:
+                    key, doa = blocks[arg]
+                    size = self.sizes[key][doa]
+                    f.write(pickle.BINBYTES + struct.pack('<I', size))
+                    # the blocks are replaced in the order they were written
+                    for part in self._chunks(size):
+                        f.write(sources[key].read(part))
+                    continue
+                f.write(stream[pos:end])
+        finally:
+            for src in sources.values():
+                src.close()
+
+    def _chunks(self, nbytes):
+        for start in range(0, nbytes, self.chunk_size):
+            yield min(self.chunk_size, nbytes - start)
+
+    def _remove_files(self):
+        for key in self.files:
+            if os.path.exists(self._tmp_name(key)):
+                os.remove(self._tmp_name(key))
+
+    def abort(self):
+        """
+        Function that removes all temporary files of an unfinished configuration
+        """
+        for f in self.files.values():
+            f.close()
+        self._remove_files()
+        if os.path.exists(self.filename + '.tmp'):
+            os.remove(self.filename + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ShardStreamWriter:
+    '''
+    Appends the DOA blocks of one configuration to a shard store as soon as they are generated. The blocks become visible in the index only when all DOAs are written
+    '''
+    def __init__(self, path, densify=None, shard_size=1 << 30, dtype=np.float64, **meta):
+        """
+        :param path: (str) directory of the store
+        :param densify: function that turns a sparse direct path into dense impulse responses, None if they are dense
+        :param shard_size: (int) number of bytes after which a new shard file is started
+        :param dtype: dtype the blocks are stored with
+        :param meta: metadata of the configuration, see ShardWriter.append
+        """
+        self.path = path
+        self.densify = densify
+        self.meta = meta
+        self.writer = ShardWriter(path, dtype=dtype, shard_size=shard_size)
+
+    @property
+    def bytes_written(self):
+        return self.writer.bytes_written
+
+    def append(self, vec, rir, dirrir, **meta):
+        """
+        :param vec: (array) unit-norm vector pointing from array to source
+        :param rir: (array) room impulse responses of shape (nsample, M)
+        :param dirrir: direct path impulse responses of shape (nsample, M) or sparse dict
+        :param meta: metadata that differs from the configuration for this block, e.g. the T60 if one job writes several reverberation times
+        """
+        meta = dict(self.meta, **meta)
+        self.writer.append(rir, 'RIR', doa=vec, **meta)
+        self.writer.append(dirrir if self.densify is None else self.densify(dirrir), 'DirectRIR', doa=vec, **meta)
+
+    def close(self):
+        self.writer.close()
+
+    def abort(self):
+        self.writer.pending = []
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class BackgroundWriter:
+    '''
+    Runs the appends of stream writers in a background thread, so the next DOA is synthesized while the previous one is serialized and written. At most max_pending blocks wait in the queue, a full queue blocks the producer, which caps the memory. An error of the thread is raised by the next submit or by close, the remaining blocks are then discarded
+    '''
+    def __init__(self, max_pending=4):
+        """
+        :param max_pending: (int) number of submitted appends that may wait for the thread
+        """
+        self.queue = queue.Queue(max_pending)
+        self.error = None
+        self.busy = 0.
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            if self.error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                task[0](*task[1], **task[2])
+            except BaseException as e:
+                self.error = e
+            self.busy += time.perf_counter() - start
+
+    def _raise(self):
+        if self.error is not None:
+            raise self.error
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Function that queues func(*args, **kwargs), it blocks while the queue is full
+
+        :param func: e.g. the append of a stream writer
+        """
+        self._raise()
+        self.queue.put((func, args, kwargs))
+
+    def close(self):
+        """
+        Function that waits until all submitted appends are done and raises the error of the thread, if any
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self._raise()
+
+    def abort(self):
+        """
+        Function that discards the waiting appends and stops the thread
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.queue.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
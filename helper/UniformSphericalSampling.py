@@ -16,7 +16,10 @@ def sample_sphere_uniformly_geometric(N):
     k = np.arange(1,N+1)
     h = -1+2*(k-1)/(N-1)
     elevation = np.arccos(h)
-    azimuth = np.cumsum((np.asarray([0]+list(3.6/np.sqrt(N*(1-h**2))[1:-1]) +[0]) )%(2*np.pi))%(2*np.pi)
+    # the poles get no azimuth step
+    steps = np.zeros(N)
+    steps[1:-1] = 3.6/np.sqrt(N*(1-h[1:-1]**2))
+    azimuth = np.cumsum(steps%(2*np.pi))%(2*np.pi)
     azimuth[-1]=0
     return (azimuth-np.pi,elevation-np.pi/2)
 
@@ -84,6 +87,66 @@ def sample_sphere_uniformly2_stochastic():
     elevation = np.arcsin(np.linalg.norm(np.cross(rv_xy,rv)))*np.sign(rv[-1])
     azimuth = np.arccos(np.dot(np.array([1,0,0]),rv_xy))*np.sign(rv[-2])
     return (azimuth,elevation)
+
+
+def vectors_to_angles(vectors):
+    """
+    Function that converts unit vectors to the azimuth and elevation angles of the stochastic samplers
+
+    :param vectors: (array) unit vectors of shape (N, 3)
+    :return: azimuth angles between - pi and pi and elevation angles between -pi/2 and pi/2
+    :rtype: float tuple
+    """
+    azimuth = np.arctan2(vectors[:,1], vectors[:,0])
+    elevation = np.arcsin(np.clip(vectors[:,2], -1, 1))
+    return (azimuth,elevation)
+
+def angles_to_vectors(azimuth, elevation):
+    """
+    Function that converts azimuth and elevation angles to unit vectors, the inverse of vectors_to_angles
+
+    :param azimuth: (array) azimuth angles
+    :param elevation: (array) elevation angles
+    :return: (array) unit vectors of shape (N, 3)
+    """
+    azimuth, elevation = np.asarray(azimuth), np.asarray(elevation)
+    return np.stack([np.cos(elevation)*np.cos(azimuth), np.cos(elevation)*np.sin(azimuth), np.sin(elevation)], axis=-1)
+
+def _result(vectors, as_vectors):
+    return vectors if as_vectors else vectors_to_angles(vectors)
+
+def sample_sphere_uniformly_stochastic_batch(N, rng=None, as_vectors=False):
+    """
+    Batch version of sample_sphere_uniformly_stochastic: N directions from normalized gaussian vectors in one call
+
+    :param N: (int) number of directions
+    :param rng: (np.random.Generator) random number generator, a fresh one if None
+    :param as_vectors: (bool) return unit vectors of shape (N, 3) instead of angles
+    :return: azimuth angles between - pi and pi and elevation angles between -pi/2 and pi/2, or unit vectors
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    vectors = rng.standard_normal((N, 3))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return _result(vectors, as_vectors)
+
+def sample_halfsphere_uniformly_stochastic_batch(N, rng=None, as_vectors=False):
+    """
+    Batch version of sample_halfsphere_uniformly_stochastic: N directions with non-negative elevation, see sample_sphere_uniformly_stochastic_batch
+    """
+    vectors = sample_sphere_uniformly_stochastic_batch(N, rng, as_vectors=True)
+    vectors[:,2] = np.abs(vectors[:,2])
+    return _result(vectors, as_vectors)
+
+def sample_sphere_uniformly2_stochastic_batch(N, rng=None, as_vectors=False):
+    """
+    Batch version of sample_sphere_uniformly2_stochastic: N directions from a uniform azimuth and a uniform height, see sample_sphere_uniformly_stochastic_batch
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    theta = rng.random(N)*2*np.pi
+    u = rng.random(N)*2 - 1
+    r = np.sqrt(1 - u**2)
+    return _result(np.stack([r*np.cos(theta), r*np.sin(theta), u], axis=1), as_vectors)
+
 '''
 For Visualization
 az = []
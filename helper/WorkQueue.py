@@ -0,0 +1,272 @@
+import os
+import json
+import hashlib
+import time
+import socket
+import threading
+import traceback
+import numpy as np
+
+class WorkQueue:
+    '''
+    Queue of jobs in a directory on a filesystem shared by all nodes of a sweep. Every job is a file in jobs/, a worker claims it by hard-linking a lock file into claims/ (atomic also on NFS) and keeps the claim alive by touching the lock. Claims whose heartbeat is older than stale_timeout belong to dead workers and are re-queued. Finished jobs get a record in done/ or failed/
+    '''
+    def __init__(self, path, heartbeat_interval=30, stale_timeout=300):
+        """
+        :param path: (str) directory of the queue
+        :param heartbeat_interval: (float) seconds between two heartbeats of a claim
+        :param stale_timeout: (float) seconds without heartbeat after which a claim is re-queued
+        """
+        self.path = path
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_timeout = stale_timeout
+        for sub in ['jobs', 'claims', 'done', 'failed']:
+            os.makedirs(os.path.join(path, sub), exist_ok=True)
+
+    def _file(self, sub, job_id):
+        return os.path.join(self.path, sub, job_id + '.json')
+
+    def _write(self, filename, record):
+        tmp = '{}.{}.{}.tmp'.format(filename, socket.gethostname(), os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp, filename)
+
+    def _read(self, filename):
+        with open(filename) as f:
+            return json.load(f)
+
+    def _ids(self, sub):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.path, sub)) if name.endswith('.json'))
+
+    def now(self):
+        """
+        :return: (float) current time of the shared filesystem, so heartbeats of nodes with skewed clocks are comparable
+        """
+        # one probe per host, shared by its workers, so a sweep leaves at most one file per node
+        probe = os.path.join(self.path, 'claims', '.clock.{}'.format(socket.gethostname()))
+        with open(probe, 'a'):
+            os.utime(probe, None)
+        return os.stat(probe).st_mtime
+
+    @staticmethod
+    def job_id(job):
+        """
+        :param job: (dict) keyword arguments of a job
+        :return: (str) id of the job, a hash of its arguments
+        """
+        return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()[:16]
+
+    def put(self, jobs):
+        """
+        Function that adds jobs to the queue, jobs that are already in the queue keep their state. A job is identified by its content, so filling the queue again with a changed or reordered grid does not confuse the records of different jobs
+
+        :param jobs: (list of dict) keyword arguments of the jobs
+        :return: (int) number of added jobs
+        """
+        added = 0
+        for job in jobs:
+            filename = self._file('jobs', self.job_id(job))
+            if not os.path.exists(filename):
+                self._write(filename, job)
+                added += 1
+        return added
+
+    def pending(self):
+        """
+        :return: ids of the jobs that are neither claimed nor finished
+        :rtype: list of str
+        """
+        finished = set(self._ids('done')) | set(self._ids('failed')) | set(self._ids('claims'))
+        return [job_id for job_id in self._ids('jobs') if job_id not in finished]
+
+    def claim(self, worker_id, rng=None):
+        """
+        Function that claims one pending job
+
+        :param worker_id: (str) id of the claiming worker
+        :param rng: (np.random.Generator) random order in which pending jobs are tried, so workers rarely compete for the same job
+        :return: Tuple of the job id and the job, None if no job is pending
+        :rtype: Tuple
+        """
+        pending = self.pending()
+        if rng is not None:
+            rng.shuffle(pending)
+        for job_id in pending:
+            lock = self._file('claims', job_id)
+            tmp = '{}.{}.tmp'.format(lock, worker_id)
+            with open(tmp, 'w') as f:
+                json.dump({'worker': worker_id, 'host': socket.gethostname(), 'pid': os.getpid(), 'claimed': self.now()}, f)
+            try:
+                # link fails if the lock exists, also on filesystems without atomic O_EXCL
+                os.link(tmp, lock)
+            except FileExistsError:
+                continue
+            finally:
+                os.remove(tmp)
+            if os.path.exists(self._file('done', job_id)) or os.path.exists(self._file('failed', job_id)):
+                # finished between listing and claiming
+                os.remove(lock)
+                continue
+            return job_id, self._read(self._file('jobs', job_id))
+        return None
+
+    def heartbeat(self, job_id):
+        os.utime(self._file('claims', job_id), None)
+
+    def release(self, job_id, worker_id, result, failed=False):
+        """
+        Function that records a finished job and removes its claim
+
+        :param job_id: (str) id of the job
+        :param worker_id: (str) id of the worker
+        :param result: (dict) record of the run, e.g. start, end and written files
+        :param failed: (bool) the job raised an exception
+        """
+        result = dict(result, worker=worker_id, host=socket.gethostname())
+        self._write(self._file('failed' if failed else 'done', job_id), result)
+        lock = self._file('claims', job_id)
+        try:
+            if self._read(lock)['worker'] == worker_id:
+                os.remove(lock)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def requeue_stale(self):
+        """
+        Function that removes the claims of workers whose last heartbeat is older than stale_timeout. A claim is first moved to a private name and checked again there, so a claim that got a heartbeat or was replaced by a new claim after the first check is put back instead of removed
+
+        :return: ids of the re-queued jobs
+        :rtype: list of str
+        """
+        now = self.now()
+        requeued = []
+        for job_id in self._ids('claims'):
+            lock = self._file('claims', job_id)
+            try:
+                info = os.stat(lock)
+                if now - info.st_mtime < self.stale_timeout:
+                    continue
+                # rename succeeds for exactly one of several workers that found the same stale claim
+                stale = '{}.stale.{}.{}'.format(lock, socket.gethostname(), os.getpid())
+                os.rename(lock, stale)
+            except FileNotFoundError:
+                continue
+            moved = os.stat(stale)
+            if moved.st_ino != info.st_ino or now - moved.st_mtime < self.stale_timeout:
+                try:
+                    # link does not replace a claim made in the meantime
+                    os.link(stale, lock)
+                except FileExistsError:
+                    pass
+                os.remove(stale)
+                continue
+            os.remove(stale)
+            requeued.append(job_id)
+        return requeued
+
+    def requeue_failed(self):
+        """
+        :return: ids of the failed jobs that are pending again
+        :rtype: list of str
+        """
+        ids = self._ids('failed')
+        for job_id in ids:
+            os.remove(self._file('failed', job_id))
+        return ids
+
+    def status(self):
+        """
+        :return: dict with the number of 'total', 'pending', 'claimed', 'done' and 'failed' jobs
+        :rtype: dict
+        """
+        done, failed, claimed = self._ids('done'), self._ids('failed'), self._ids('claims')
+        return {'total': len(self._ids('jobs')), 'pending': len(self.pending()), 'claimed': len(claimed), 'done': len(done), 'failed': len(failed)}
+
+    def throughput(self):
+        """
+        Function that reports the throughput of every node from the records of the finished jobs
+
+        :return: dict per host with the number of 'jobs', the summed job 'busy' time, the number of 'workers' and 'jobs_per_s' over the span between the first start and the last end on that host
+        :rtype: dict
+        """
+        hosts = {}
+        for job_id in self._ids('done'):
+            try:
+                record = self._read(self._file('done', job_id))
+            except (FileNotFoundError, ValueError):
+                continue
+            host = hosts.setdefault(record['host'], {'jobs': 0, 'busy': 0., 'workers': set(), 'start': np.inf, 'end': -np.inf})
+            host['jobs'] += 1
+            host['busy'] += record['end'] - record['start']
+            host['workers'].add(record['worker'])
+            host['start'] = min(host['start'], record['start'])
+            host['end'] = max(host['end'], record['end'])
+        for host in hosts.values():
+            span = host.pop('end') - host.pop('start')
+            host['workers'] = len(host['workers'])
+            host['jobs_per_s'] = host['jobs']/span if span > 0 else None
+        return hosts
+
+class Heartbeat:
+    '''
+    Background thread that touches the claim of a running job every heartbeat_interval seconds
+    '''
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.queue.heartbeat_interval):
+            try:
+                self.queue.heartbeat(self.job_id)
+            except OSError:
+                # the claim was re-queued, the job is finished anyway and its output replaced atomically
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stopped.set()
+        self.thread.join()
+
+def work(queue, run, worker_id=None, poll_interval=5, seed=None):
+    """
+    Function that claims and runs jobs until none is pending or claimed anymore
+
+    :param queue: (WorkQueue) queue of the sweep
+    :param run: function that computes a job given as keyword arguments and returns the written files
+    :param worker_id: (str) id of this worker, host and pid if None
+    :param poll_interval: (float) seconds to wait while all remaining jobs are claimed by other workers
+    :param seed: seed of the order in which pending jobs are tried
+    :return: Tuple of the number of done and failed jobs of this worker
+    :rtype: Tuple
+    """
+    worker_id = '{}-{}'.format(socket.gethostname(), os.getpid()) if worker_id is None else worker_id
+    rng = np.random.default_rng(seed)
+    done = failed = 0
+    while True:
+        queue.requeue_stale()
+        claimed = queue.claim(worker_id, rng)
+        if claimed is None:
+            if queue.status()['claimed'] == 0:
+                return done, failed
+            # jobs of dead workers become pending once their claims are stale
+            time.sleep(poll_interval)
+            continue
+        job_id, job = claimed
+        result = {'start': time.time()}
+        try:
+            with Heartbeat(queue, job_id):
+                result['files'] = run(**job)
+            result['end'] = time.time()
+            queue.release(job_id, worker_id, result)
+            done += 1
+        except Exception:
+            result.update(end=time.time(), error=traceback.format_exc())
+            queue.release(job_id, worker_id, result, failed=True)
+            failed += 1
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from helper.Backends import NumpyBackend, RIRGeneratorBackend
+
+pytest.importorskip('rir_generator')
+
+C = 343
+RATE = 16000
+
+CASES = [
+    # room, mics, source, reverberation time
+    ([5, 4, 3], [[2., 1.5, 1.2], [2.1, 1.5, 1.2]], [1.1, 3.2, 1.4], 0.2),
+    ([6, 5, 3], [[3.3, 2.2, 1.7], [1.05, 1.11, 2.6], [4.2, 0.9, 0.4]], [4.5, 3.5, 2.5], 0.4),
+    ([9, 7.5, 3.5], [[4.5, 3.7, 1.5], [4.6, 3.8, 1.5], [4.4, 3.8, 1.6], [4.5, 3.6, 1.4]], [1.5, 2.2, 1.8], 0.6),
+]
+
+@pytest.mark.parametrize('room, mics, source, T60', CASES)
+@pytest.mark.parametrize('order', [0, 1, 3, -1])
+def test_numpy_backend_matches_rir_generator(room, mics, source, T60, order):
+    mics, source, room = np.array(mics), np.array(source), np.array(room)
+    nsample = int(T60*RATE)
+    reference = RIRGeneratorBackend().generate(C, RATE, mics, source, room, T60, nsample, order)
+    result = NumpyBackend().generate(C, RATE, mics, source, room, T60, nsample, order)
+    assert result.shape == reference.shape
+    np.testing.assert_allclose(result, reference, rtol=0, atol=1e-8*np.abs(reference).max())
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from helper.DirectPath import direct_path, densify_direct_path
+
+rir_generator = pytest.importorskip('rir_generator')
+
+C = 343
+RATE = 16000
+ROOM = [5, 4, 3]
+
+MICS = [
+    np.array([[2., 1.5, 1.2]]),
+    np.array([[2., 1.5, 1.2], [2.1, 1.5, 1.2], [2.2, 1.5, 1.2], [2.3, 1.5, 1.2]]),
+    np.array([[3.3, 2.2, 1.7], [1.05, 1.11, 2.6], [4.2, 0.9, 0.4]]),
+]
+
+@pytest.mark.parametrize('mics', MICS)
+@pytest.mark.parametrize('source', [[1.1, 3.2, 1.4], [4.5, 3.5, 2.5]])
+def test_direct_path_matches_order_zero(mics, source):
+    source = np.array(source)
+    reference = rir_generator.generate(C, RATE, mics, source, ROOM, reverberation_time=0.4, nsample=2000, order=0)
+    np.testing.assert_allclose(direct_path(mics, source, C, RATE, 2000), reference, rtol=0, atol=1e-12)
+
+def test_direct_path_after_last_sample_is_dropped():
+    mics, source = MICS[0], np.array([4.5, 3.5, 2.5])
+    reference = rir_generator.generate(C, RATE, mics, source, ROOM, reverberation_time=0.4, nsample=100, order=0)
+    np.testing.assert_allclose(direct_path(mics, source, C, RATE, 100), reference, rtol=0, atol=1e-12)
+
+def test_sparse_direct_path_densifies_to_dense():
+    mics, source = MICS[2], np.array([1.1, 3.2, 1.4])
+    sparse = direct_path(mics, source, C, RATE, 2000, sparse=True)
+    np.testing.assert_array_equal(densify_direct_path(sparse, RATE), direct_path(mics, source, C, RATE, 2000))
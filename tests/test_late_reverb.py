@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from helper.Decay import decay_time, direct_to_reverberant_ratio, schroeder_curve
+from helper.DirectPath import direct_path
+from RIR_write_quaternion import synthesize
+
+C = 343
+RATE = 16000
+MICS = np.array([[2., 1.5, 1.2], [2.1, 1.5, 1.2], [3.3, 2.2, 1.7]])
+
+CASES = [
+    # room, sources, reverberation time
+    ([6, 5, 3], [[4.1, 3.2, 1.4], [1., 4., 2.]], 0.6),
+    ([8, 6, 3.5], [[6.5, 4.8, 1.6], [4.2, 1.1, 2.9]], 0.9),
+]
+
+def synthesize_pair(room, sources, T60, order, seed=0):
+    room, sources = np.array(room, dtype=float), np.array(sources)
+    full = synthesize(MICS, sources, room, T60, 'numpy', mixing_time=None)
+    hybrid = synthesize(MICS, sources, room, T60, 'numpy', np.random.default_rng(seed), mixing_time=0.05, early_order=order)
+    return sources, full, hybrid
+
+@pytest.mark.parametrize('room, sources, T60', CASES)
+@pytest.mark.parametrize('order', [-1, 2])
+def test_hybrid_decay_matches_full_image_sources(room, sources, T60, order):
+    _, full, hybrid = synthesize_pair(room, sources, T60, order)
+    for imp_full, imp_hybrid in zip(full, hybrid):
+        np.testing.assert_allclose(decay_time(imp_hybrid, RATE, 5, 35), decay_time(imp_full, RATE, 5, 35), rtol=0.05)
+        edc_full, edc_hybrid = schroeder_curve(imp_full), schroeder_curve(imp_hybrid)
+        # down to 30 dB of decay
+        stop = np.argmax((edc_full < -30).all(axis=1))
+        assert np.abs(edc_hybrid[:stop] - edc_full[:stop]).max() < 1.5
+
+@pytest.mark.parametrize('room, sources, T60', CASES)
+@pytest.mark.parametrize('order', [-1, 2])
+def test_hybrid_direct_to_reverberant_ratio_matches_full_image_sources(room, sources, T60, order):
+    sources, full, hybrid = synthesize_pair(room, sources, T60, order)
+    for source, imp_full, imp_hybrid in zip(sources, full, hybrid):
+        direct = direct_path(MICS, source, C, RATE, len(imp_full))
+        np.testing.assert_allclose(direct_to_reverberant_ratio(imp_hybrid, direct), direct_to_reverberant_ratio(imp_full, direct), atol=1)
+
+def test_order_without_mixing_time_is_rejected():
+    with pytest.raises(ValueError):
+        synthesize(MICS, np.array([[4.1, 3.2, 1.4]]), np.array([6., 5, 3]), 0.6, 'numpy', mixing_time=None, early_order=2)
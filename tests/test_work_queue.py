@@ -0,0 +1,49 @@
+import os
+import time
+import socket
+import multiprocessing
+import numpy as np
+from helper.WorkQueue import WorkQueue, work
+
+def run(n, out):
+    # a duplicate run of a job fails to create its file
+    with open(os.path.join(out, '{}.{}'.format(n, os.getpid())), 'x'):
+        pass
+    time.sleep(0.01)
+    return [n]
+
+def run_worker(path, seed):
+    queue = WorkQueue(path, heartbeat_interval=0.2, stale_timeout=2)
+    work(queue, run, poll_interval=0.1, seed=seed)
+
+def test_local_workers_run_every_job_once(tmp_path):
+    path, out = str(tmp_path/'queue'), tmp_path/'out'
+    out.mkdir()
+    queue = WorkQueue(path, heartbeat_interval=0.2, stale_timeout=2)
+    jobs = [{'n': n, 'out': str(out)} for n in range(30)]
+    assert queue.put(jobs) == 30
+    assert queue.put(jobs) == 0
+    # a claim of a dead worker, its heartbeat is older than stale_timeout
+    stale_id, _ = queue.claim('dead-worker')
+    lock = os.path.join(path, 'claims', stale_id + '.json')
+    os.utime(lock, (time.time() - 100,)*2)
+    workers = [multiprocessing.Process(target=run_worker, args=(path, seed)) for seed in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    runs = [name.split('.')[0] for name in os.listdir(out)]
+    assert sorted(map(int, runs)) == list(range(30))
+    assert queue.status() == {'total': 30, 'pending': 0, 'claimed': 0, 'done': 30, 'failed': 0}
+    # only the probe of this host is left besides the claims
+    assert os.listdir(os.path.join(path, 'claims')) == ['.clock.{}'.format(socket.gethostname())]
+
+def test_fresh_claim_is_not_requeued(tmp_path):
+    queue = WorkQueue(str(tmp_path), stale_timeout=2)
+    queue.put([{'n': 0}])
+    job_id, _ = queue.claim('worker', np.random.default_rng(0))
+    assert queue.requeue_stale() == []
+    os.utime(os.path.join(str(tmp_path), 'claims', job_id + '.json'), (time.time() - 100,)*2)
+    assert queue.requeue_stale() == [job_id]
+    assert queue.pending() == [job_id]